@@ -0,0 +1,125 @@
+# Copyright 2020 The MiNLP Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import os
+import sys
+import random
+import bisect
+import itertools
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from minlptokenizer.config import configs
+from minlptokenizer.lexicon import read_words
+
+pwd = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PUNCTUATIONS = '，。、；：？！'
+# 句子长度分布：(最短, 最长)，mixed为对数正态分布，模拟真实语料中短句多、长句少的情况
+LENGTH_DISTRIBUTIONS = {
+    'short': (4, 20),
+    'medium': (20, 100),
+    'long': (100, configs['tokenizer_limit']['max_string_length']),
+    'mixed': (4, configs['tokenizer_limit']['max_string_length']),
+}
+
+
+class CorpusGenerator:
+    def __init__(self, seed=0):
+        """
+        合成语料生成器：从内置词典中随机取词、从字表中随机取字拼接成句，相同seed生成的语料完全一致
+        :param seed: 随机种子
+        """
+        self.random = random.Random(seed)
+        self.words = sorted(set(word for path in configs['lexicon_files']
+                                for word in read_words(os.path.join(pwd, 'minlptokenizer', path))))
+        with open(os.path.join(pwd, 'minlptokenizer', configs['vocab_path']), encoding='UTF-8') as fin:
+            self.chars = [char for char in fin.read().splitlines() if len(char) == 1]
+        # 字表按字频排序，按Zipf分布取字使合成语料的字频接近真实文本
+        self.char_weights = list(itertools.accumulate(1.0 / rank for rank in range(1, len(self.chars) + 1)))
+
+    def char(self):
+        """
+        按Zipf分布随机取一个字
+        :return: 字
+        """
+        return self.chars[bisect.bisect(self.char_weights, self.random.random() * self.char_weights[-1])]
+
+    def sentence_length(self, distribution):
+        """
+        按分布采样句子长度
+        :param distribution: 长度分布名称，见LENGTH_DISTRIBUTIONS
+        :return: 句子长度
+        """
+        low, high = LENGTH_DISTRIBUTIONS[distribution]
+        if distribution == 'mixed':
+            return min(max(int(self.random.lognormvariate(3.0, 1.0)), low), high)
+        return self.random.randint(low, high)
+
+    def sentence(self, length):
+        """
+        生成指定长度的句子，约七成为词典词，其余为随机字，每隔若干词插入标点
+        :param length: 句子长度
+        :return: 句子
+        """
+        pieces = []
+        size = 0
+        while size < length:
+            roll = self.random.random()
+            if roll < 0.7:
+                piece = self.random.choice(self.words)
+            elif roll < 0.9:
+                piece = self.char()
+            else:
+                piece = self.random.choice(PUNCTUATIONS)
+            pieces.append(piece)
+            size += len(piece)
+        return ''.join(pieces)[:length]
+
+    def corpus(self, size, distribution='mixed'):
+        """
+        生成语料
+        :param size: 句子数
+        :param distribution: 长度分布名称
+        :return: 句子列表
+        """
+        return [self.sentence(self.sentence_length(distribution)) for _ in range(size)]
+
+    def lexicon(self, size, min_length=2, max_length=6):
+        """
+        生成随机词表，用于词典规模测试
+        :param size: 词数
+        :param min_length: 最短词长
+        :param max_length: 最长词长
+        :return: 词列表
+        """
+        return [''.join(self.char() for _ in range(self.random.randint(min_length, max_length)))
+                for _ in range(size)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='生成分词性能测试用的合成语料')
+    parser.add_argument('output', help='输出文件，每行一句')
+    parser.add_argument('--size', type=int, default=10000, help='句子数')
+    parser.add_argument('--distribution', default='mixed', choices=sorted(LENGTH_DISTRIBUTIONS), help='句子长度分布')
+    parser.add_argument('--seed', type=int, default=0, help='随机种子')
+    args = parser.parse_args()
+    with open(args.output, 'w', encoding='UTF-8') as fout:
+        for text in CorpusGenerator(args.seed).corpus(args.size, args.distribution):
+            fout.write(text + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,267 @@
+# Copyright 2020 The MiNLP Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import statistics
+import subprocess
+import multiprocessing
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from corpus import CorpusGenerator, LENGTH_DISTRIBUTIONS
+from minlptokenizer.tokenizer import MiNLPTokenizer
+from minlptokenizer.lexicon import Lexicon
+
+SUITES = ('latency', 'throughput', 'n_jobs', 'lexicon', 'multi_granularity', 'cold_start')
+# 冷启动在子进程中测量，避免TensorFlow和模型已加载的影响
+COLD_START_SCRIPT = '''
+import sys, json, time
+start = time.perf_counter()
+sys.path.insert(0, %r)
+from minlptokenizer.tokenizer import MiNLPTokenizer
+tokenizer = MiNLPTokenizer(granularity=%r)
+tokenizer.cut('今天天气怎么样？')
+stats = tokenizer.startup_stats()
+stats['total'] = time.perf_counter() - start
+print(json.dumps(stats))
+'''
+
+
+def timed(func, *args, **kwargs):
+    """
+    执行函数并计时
+    :return: 耗时（秒）
+    """
+    start = time.perf_counter()
+    func(*args, **kwargs)
+    return time.perf_counter() - start
+
+
+def percentiles(samples):
+    """
+    延迟统计（毫秒）
+    :param samples: 耗时样本（秒）
+    :return: 均值及p50、p90、p99、最大值
+    """
+    samples = np.asarray(samples) * 1000
+    return {
+        'mean_ms': float(samples.mean()),
+        'p50_ms': float(np.percentile(samples, 50)),
+        'p90_ms': float(np.percentile(samples, 90)),
+        'p99_ms': float(np.percentile(samples, 99)),
+        'max_ms': float(samples.max()),
+    }
+
+
+def throughput(func, texts, repeat):
+    """
+    多次执行取中位数耗时，计算吞吐量
+    :param func: 处理整个语料的函数
+    :param texts: 语料
+    :param repeat: 重复次数
+    :return: 每秒字符数与每秒句子数
+    """
+    elapsed = statistics.median(timed(func, texts) for _ in range(repeat))
+    return {
+        'chars_per_sec': sum(map(len, texts)) / elapsed,
+        'texts_per_sec': len(texts) / elapsed,
+        'seconds': elapsed,
+    }
+
+
+def bench_latency(tokenizer, generator, args):
+    """
+    单句分词延迟
+    """
+    texts = generator.corpus(args.latency_samples, 'short')
+    tokenizer.cut(texts[0])
+    return percentiles([timed(tokenizer.cut, text) for text in texts])
+
+
+def bench_throughput(tokenizer, generator, args):
+    """
+    不同批大小和句长分布下的批量分词吞吐量
+    """
+    results = {}
+    for distribution in sorted(LENGTH_DISTRIBUTIONS):
+        texts = generator.corpus(args.corpus_size, distribution)
+        for batch_size in args.batch_sizes:
+            def run(corpus):
+                for i in range(0, len(corpus), batch_size):
+                    tokenizer.cut(corpus[i:i + batch_size], length_bucketing=args.length_bucketing)
+            run(texts[:batch_size])
+            results['%s/batch_%d' % (distribution, batch_size)] = throughput(run, texts, args.repeat)
+    return results
+
+
+def bench_n_jobs(tokenizer, generator, args):
+    """
+    多进程分词的扩展性，进程池在计时前创建并复用
+    """
+    results = {}
+    texts = generator.corpus(args.corpus_size, 'mixed')
+    for n_jobs in args.n_jobs:
+        tokenizer.cut(texts[:n_jobs], n_jobs=n_jobs)
+        results['n_jobs_%d' % n_jobs] = throughput(lambda corpus: tokenizer.cut(corpus, n_jobs=n_jobs),
+                                                   texts, args.repeat)
+    tokenizer.close()
+    return results
+
+
+def bench_lexicon(tokenizer, generator, args):
+    """
+    词典规模对词典构建和get_factor的影响
+    """
+    results = {}
+    texts = generator.corpus(args.corpus_size, 'mixed')
+    for size in args.lexicon_sizes:
+        words = generator.lexicon(size)
+        start = time.perf_counter()
+        lexicon = Lexicon(words)
+        lexicon.make_automaton()
+        build_seconds = time.perf_counter() - start
+        result = throughput(lexicon.get_factor, texts, args.repeat)
+        result['build_seconds'] = build_seconds
+        results['words_%d' % size] = result
+    return results
+
+
+def bench_multi_granularity(tokenizer, generator, args):
+    """
+    同时需要细粒度和粗粒度结果时，两个分词器依次分词与cut_multi的吞吐量对比
+    """
+    texts = generator.corpus(args.corpus_size, 'mixed')
+    tokenizers = [MiNLPTokenizer(granularity=granularity, backend=args.backend) for granularity in ('fine', 'coarse')]
+    for other in tokenizers:
+        other.warmup()
+    return {
+        'separate': throughput(lambda corpus: [other.cut(corpus) for other in tokenizers], texts, args.repeat),
+        'cut_multi': throughput(tokenizer.cut_multi, texts, args.repeat),
+    }
+
+
+def bench_cold_start(tokenizer, generator, args):
+    """
+    冷启动耗时：新进程中从导入到首次分词完成
+    """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    script = COLD_START_SCRIPT % (root, args.granularity)
+    runs = [json.loads(subprocess.check_output([sys.executable, '-c', script]).decode().splitlines()[-1])
+            for _ in range(args.repeat)]
+    return {key + '_seconds': statistics.median(run[key] for run in runs if key in run)
+            for key in sorted(set().union(*runs))}
+
+
+def environment():
+    """
+    运行环境信息，便于比较不同机器上的结果
+    """
+    info = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'processor': platform.processor(),
+        'cpu_count': multiprocessing.cpu_count(),
+        'numpy': np.__version__,
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+    try:
+        import tensorflow
+        info['tensorflow'] = tensorflow.__version__
+    except ImportError:
+        pass
+    return info
+
+
+def flatten(results, prefix=''):
+    """
+    将嵌套结果展开为{'suite/case/metric': value}
+    """
+    metrics = {}
+    for key, value in results.items():
+        if isinstance(value, dict):
+            metrics.update(flatten(value, prefix + key + '/'))
+        else:
+            metrics[prefix + key] = value
+    return metrics
+
+
+def compare(results, baseline, tolerance):
+    """
+    与基线结果比较，吞吐量下降或耗时增加超过tolerance视为性能退化
+    :param results: 本次结果
+    :param baseline: 基线结果
+    :param tolerance: 允许的相对变化
+    :return: 退化的指标列表
+    """
+    current, previous = flatten(results), flatten(baseline)
+    regressions = []
+    for key in sorted(set(current) & set(previous)):
+        if not previous[key]:
+            continue
+        change = current[key] / previous[key] - 1
+        higher_is_better = key.endswith('_per_sec')
+        regressed = change < -tolerance if higher_is_better else change > tolerance
+        print('%-60s %14.4f %14.4f %+8.1f%%%s' % (key, previous[key], current[key], change * 100,
+                                                  '  REGRESSION' if regressed else ''))
+        if regressed:
+            regressions.append(key)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='MiNLP-Tokenizer性能测试')
+    parser.add_argument('--suite', nargs='+', default=list(SUITES), choices=SUITES, help='测试项')
+    parser.add_argument('--granularity', default='fine', choices=('fine', 'coarse'), help='分词粒度')
+    parser.add_argument('--backend', default='tf', help='推理后端')
+    parser.add_argument('--corpus-size', type=int, default=2000, help='吞吐量测试的句子数')
+    parser.add_argument('--latency-samples', type=int, default=500, help='延迟测试的句子数')
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 8, 32, 128], help='批大小')
+    parser.add_argument('--n-jobs', type=int, nargs='+', default=[1, 2, 4], help='进程数')
+    parser.add_argument('--lexicon-sizes', type=int, nargs='+', default=[1000, 10000, 100000], help='词典词数')
+    parser.add_argument('--length-bucketing', action='store_true', help='吞吐量测试时按长度分桶')
+    parser.add_argument('--repeat', type=int, default=3, help='重复次数，取中位数')
+    parser.add_argument('--seed', type=int, default=0, help='语料随机种子')
+    parser.add_argument('--output', help='JSON结果输出路径')
+    parser.add_argument('--baseline', help='基线JSON结果，与之比较并在性能退化时返回非零')
+    parser.add_argument('--tolerance', type=float, default=0.1, help='允许的相对变化')
+    args = parser.parse_args()
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding='UTF-8') as fin:
+            baseline = json.load(fin)['results']
+    tokenizer = MiNLPTokenizer(granularity=args.granularity, backend=args.backend)
+    tokenizer.warmup()
+    results = {}
+    for suite in args.suite:
+        # 每个测试项使用相同种子，单独运行某一项时语料不变
+        results[suite] = globals()['bench_' + suite](tokenizer, CorpusGenerator(args.seed), args)
+        print(json.dumps({suite: results[suite]}, indent=2, sort_keys=True))
+    report = {'environment': environment(), 'arguments': vars(args), 'results': results}
+    if args.output:
+        with open(args.output, 'w', encoding='UTF-8') as fout:
+            json.dump(report, fout, indent=2, sort_keys=True)
+    if baseline is not None and compare(results, baseline, args.tolerance):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
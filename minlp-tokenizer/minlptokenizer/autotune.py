@@ -0,0 +1,292 @@
+# Copyright 2020 The MiNLP Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+from minlptokenizer.config import configs
+
+PROFILE_VERSION = 1
+
+
+def available_cpus():
+    """
+    当前进程可用的CPU核数，容器中受CPU亲和性限制
+    :return: 核数
+    """
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return multiprocessing.cpu_count()
+
+
+def machine_info():
+    """
+    机器标识，调优配置只在相同的机器类型上生效
+    :return: 字典
+    """
+    return {'cpus': available_cpus(), 'machine': platform.machine(), 'processor': platform.processor()}
+
+
+def profile_key(backend, granularity):
+    return '%s/%s' % (backend, granularity)
+
+
+def read_profiles(path):
+    """
+    读取调优配置文件，文件不存在、格式版本或机器标识不一致时返回空字典
+    :param path: 调优配置文件路径
+    :return: {推理后端/分词粒度: 调优配置}
+    """
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='UTF-8') as fin:
+        data = json.load(fin)
+    if data.get('version') != PROFILE_VERSION or data.get('machine') != machine_info():
+        return {}
+    return data.get('profiles', {})
+
+
+def load_profile(profile=True, backend='tf', granularity='fine'):
+    """
+    读取推理后端和分词粒度对应的调优配置
+    :param profile: True表示config中的默认路径，也可传入调优配置文件路径或autotune返回的配置字典
+    :param backend: 推理后端
+    :param granularity: 分词粒度
+    :return: 调优配置，没有可用配置时返回空字典
+    """
+    if isinstance(profile, dict):
+        return dict(profile)
+    path = configs['autotune']['profile_path'] if profile is True else profile
+    return dict(read_profiles(path).get(profile_key(backend, granularity), {}))
+
+
+def save_profile(profile, backend='tf', granularity='fine', path=configs['autotune']['profile_path']):
+    """
+    保存调优配置，同一文件中保留其他推理后端和分词粒度的配置，先写临时文件再重命名
+    :param profile: 调优配置
+    :param backend: 推理后端
+    :param granularity: 分词粒度
+    :param path: 调优配置文件路径
+    """
+    profiles = read_profiles(path)
+    profiles[profile_key(backend, granularity)] = profile
+    data = {'version': PROFILE_VERSION, 'machine': machine_info(), 'profiles': profiles}
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = '%s.%d.tmp' % (path, os.getpid())
+    with open(tmp_path, 'w', encoding='UTF-8') as fout:
+        json.dump(data, fout, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def default_n_jobs(cpus):
+    """
+    进程数搜索空间：不超过可用核数的2的幂及可用核数本身
+    """
+    n_jobs = [1]
+    while n_jobs[-1] * 2 <= cpus:
+        n_jobs.append(n_jobs[-1] * 2)
+    return n_jobs if n_jobs[-1] == cpus else n_jobs + [cpus]
+
+
+def thread_candidates(cpus, n_jobs_list):
+    """
+    进程数和每个进程推理后端线程数的搜索空间：默认配置，以及每个进程单线程或平分可用核数
+    :param cpus: 可用核数
+    :param n_jobs_list: 进程数列表
+    :return: [(进程数, 算子内线程数, 算子间线程数)]
+    """
+    candidates = [(1, 0, 0)]
+    for n_jobs in n_jobs_list:
+        for intra_op_threads in sorted({1, max(cpus // n_jobs, 1)}):
+            candidates.append((n_jobs, intra_op_threads, 1))
+    return candidates
+
+
+def measure(texts, granularity, backend, n_jobs, intra_op_threads, inter_op_threads, batch_size, repeat):
+    """
+    测量一组参数的吞吐量和单个batch的延迟，进程池和模型在计时前加载。
+    多进程时先创建进程池，由worker加载模型，当前进程在进程池关闭后才加载模型，避免在已初始化TensorFlow的进程中fork
+    :return: 测量结果
+    """
+    from minlptokenizer.tokenizer import MiNLPTokenizer  # 避免与tokenizer循环导入
+    tokenizer = MiNLPTokenizer(granularity=granularity, backend=backend, intra_op_threads=intra_op_threads,
+                               inter_op_threads=inter_op_threads, batch_size=batch_size)
+    with tokenizer:
+        if n_jobs == 1:
+            tokenizer.warmup()
+        tokenizer.cut(texts[:batch_size * n_jobs], n_jobs=n_jobs)
+        elapsed = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            tokenizer.cut(texts, n_jobs=n_jobs)
+            elapsed.append(time.perf_counter() - start)
+        tokenizer.close()
+        latencies = []
+        for i in range(0, len(texts), batch_size):
+            start = time.perf_counter()
+            tokenizer.cut(texts[i:i + batch_size], n_jobs=1)
+            latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    return {
+        'n_jobs': n_jobs,
+        'intra_op_threads': intra_op_threads,
+        'inter_op_threads': inter_op_threads,
+        'max_batch_size': batch_size,
+        'chars_per_sec': sum(map(len, texts)) / statistics.median(elapsed),
+        'batch_latency_p50': latencies[len(latencies) // 2],
+        'batch_latency_p95': latencies[min(int(len(latencies) * 0.95), len(latencies) - 1)],
+    }
+
+
+def _measure_worker(connection, args):
+    try:
+        connection.send((True, measure(*args)))
+    except Exception as e:
+        connection.send((False, e))
+    finally:
+        connection.close()
+
+
+def measure_in_process(*args):
+    """
+    在新启动（spawn）的进程中执行measure，每组参数的模型、线程池和进程池互不影响，调优进程本身不加载TensorFlow
+    :param args: measure的参数
+    :return: 测量结果
+    """
+    context = multiprocessing.get_context('spawn')
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(target=_measure_worker, args=(sender, args))
+    process.start()
+    sender.close()
+    try:
+        succeeded, result = receiver.recv()
+    except EOFError:
+        process.join()
+        raise RuntimeError('autotune trial exited with code %s' % process.exitcode)
+    process.join()
+    if not succeeded:
+        raise result
+    return result
+
+
+def autotune(texts, granularity='fine', backend='tf', batch_sizes=None, n_jobs_list=None, repeat=3,
+             max_latency=None, output_path=configs['autotune']['profile_path'], log=None):
+    """
+    在样本语料上测量不同参数组合的吞吐量和延迟，选出吞吐量最高的组合：先以最大batch搜索进程数和每个进程的推理后端线程数，
+    再以选出的进程和线程配置搜索batch大小，结果保存后由MiNLPTokenizer(profile=True)在加载时应用
+    :param texts: 样本语料，每条不超过max_string_length
+    :param granularity: 分词粒度
+    :param backend: 推理后端
+    :param batch_sizes: batch大小搜索空间，默认为config中autotune的batch_sizes
+    :param n_jobs_list: 进程数搜索空间，默认为不超过可用核数的2的幂及可用核数本身
+    :param repeat: 每组参数重复次数，取中位数
+    :param max_latency: 单个batch延迟p95的上限（秒），超过的组合不参与选择，默认为None，不限制
+    :param output_path: 调优配置的保存路径，为None时不保存
+    :param log: 每组参数测量完成后调用，参数为测量结果，默认为None
+    :return: 调优配置，包含选出的参数、测量结果和全部测量记录
+    """
+    cpus = available_cpus()
+    max_batch_size = configs['tokenizer_limit']['max_batch_size']
+    batch_sizes = sorted(set(b for b in (batch_sizes or configs['autotune']['batch_sizes']) if b <= max_batch_size))
+    if not texts or not batch_sizes:
+        raise ValueError('texts and batch_sizes must not be empty')
+    trials = []
+
+    def run(*args):
+        trial = measure_in_process(texts, granularity, backend, *args, repeat)
+        trial['eligible'] = max_latency is None or trial['batch_latency_p95'] <= max_latency
+        trials.append(trial)
+        if log is not None:
+            log(trial)
+        return trial
+
+    def best(candidates):
+        eligible = [trial for trial in candidates if trial['eligible']]
+        return max(eligible or candidates, key=lambda trial: trial['chars_per_sec'])
+
+    threads = best([run(n_jobs, intra, inter, batch_sizes[-1])
+                    for n_jobs, intra, inter in thread_candidates(cpus, n_jobs_list or default_n_jobs(cpus))])
+    chosen = best([threads] + [run(threads['n_jobs'], threads['intra_op_threads'], threads['inter_op_threads'], b)
+                               for b in batch_sizes[:-1]])
+    keys = ('n_jobs', 'intra_op_threads', 'inter_op_threads', 'max_batch_size', 'chars_per_sec', 'batch_latency_p50',
+            'batch_latency_p95')
+    profile = dict((key, chosen[key]) for key in keys)
+    profile.update(tuned_at=time.strftime('%Y-%m-%d %H:%M:%S'), samples=len(texts), trials=trials)
+    if output_path is not None:
+        save_profile(profile, backend, granularity, output_path)
+    return profile
+
+
+def sample_lines(paths, size, seed=0):
+    """
+    从语料文件中等概率抽样，跳过空行和超过max_string_length的行
+    :param paths: 语料文件路径列表
+    :param size: 抽样句子数
+    :param seed: 随机种子
+    :return: 句子列表
+    """
+    rng = random.Random(seed)
+    samples = []
+    seen = 0
+    for path in paths:
+        with open(path, encoding='UTF-8') as fin:
+            for line in fin:
+                line = line.rstrip('\r\n')
+                if not line.strip() or len(line) > configs['tokenizer_limit']['max_string_length']:
+                    continue
+                seen += 1
+                if len(samples) < size:
+                    samples.append(line)
+                else:
+                    idx = rng.randrange(seen)
+                    if idx < size:
+                        samples[idx] = line
+    return samples
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='minlp-autotune', description='MiNLP-Tokenizer参数自动调优')
+    parser.add_argument('corpus', nargs='+', help='样本语料文件，每行一条文本')
+    parser.add_argument('-g', '--granularity', default='fine', choices=('fine', 'coarse'), help='分词粒度')
+    parser.add_argument('--backend', default='tf', help='推理后端')
+    parser.add_argument('--sample-size', type=int, default=configs['autotune']['sample_size'], help='抽样句子数')
+    parser.add_argument('--batch-sizes', type=int, nargs='+', help='batch大小搜索空间')
+    parser.add_argument('--n-jobs', type=int, nargs='+', help='进程数搜索空间')
+    parser.add_argument('--repeat', type=int, default=3, help='每组参数重复次数，取中位数')
+    parser.add_argument('--max-latency', type=float, help='单个batch延迟p95的上限（毫秒）')
+    parser.add_argument('-o', '--output', default=configs['autotune']['profile_path'], help='调优配置保存路径')
+    args = parser.parse_args(argv)
+    texts = sample_lines(args.corpus, args.sample_size)
+
+    def log(trial):
+        sys.stderr.write('[minlp-autotune] n_jobs=%d intra=%d inter=%d batch=%d: %.0f chars/s, p95 %.1f ms\n' % (
+            trial['n_jobs'], trial['intra_op_threads'], trial['inter_op_threads'], trial['max_batch_size'],
+            trial['chars_per_sec'], trial['batch_latency_p95'] * 1000))
+
+    max_latency = args.max_latency / 1000 if args.max_latency is not None else None
+    profile = autotune(texts, args.granularity, args.backend, args.batch_sizes, args.n_jobs, args.repeat, max_latency,
+                       args.output, log)
+    profile.pop('trials')
+    print(json.dumps(profile, indent=2, sort_keys=True))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,308 @@
+# Copyright 2020 The MiNLP Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import collections
+import os
+import threading
+import time
+import numpy as np
+from minlptokenizer.config import configs
+from minlptokenizer.crf import viterbi_decode
+from minlptokenizer.exception import UnSupportedException
+from minlptokenizer.tag import Tag
+
+os.environ['TF_CPP_MIN_LOG_LEVEL'] = '2'
+pwd = os.path.dirname(__file__)
+
+CHAR_IDS_INPUT = 'char_ids_batch:0'
+FACTOR_INPUT = 'factor_batch:0'
+TAG_IDS_OUTPUT = 'tag_ids:0'
+ELEMENTWISE_OPS = {'Identity', 'Cast', 'Add', 'AddV2', 'BiasAdd', 'Sub', 'Mul', 'RealDiv', 'Maximum', 'Minimum'}
+
+load_stats = {}  # 进程内运行时导入和各推理后端加载耗时（秒）
+_backends = {}  # 进程内共享的推理后端
+_backend_lock = threading.Lock()  # 保证多线程并发首次调用时模型只加载一次
+
+
+class InferenceBackend:
+    """
+    推理后端：输入char id矩阵和干预权重矩阵，输出标签矩阵
+    """
+    char_ids_dtype = np.int32
+    factor_dtype = np.float32
+
+    def predict(self, char_ids, factor):
+        """
+        模型预测
+        :param char_ids: char id矩阵[batch, max_len]
+        :param factor: 干预权重矩阵[batch, max_len, 5]
+        :return: 标签矩阵[batch, max_len]
+        """
+        raise NotImplementedError
+
+    def emissions(self, char_ids):
+        """
+        获取与干预矩阵合并前的发射分数，用于在Python侧进行维特比解码
+        :param char_ids: char id矩阵[batch, max_len]
+        :return: 发射分数[batch, max_len, 5]
+        """
+        raise UnSupportedException()
+
+    def interfere(self, char_ids, emissions, factor):
+        """
+        按计算图中的干预运算在发射分数上应用用户词典干预，得到输入CRF的发射分数
+        :param char_ids: char id矩阵[batch, max_len]
+        :param emissions: emissions返回的发射分数[batch, max_len, 5]
+        :param factor: 干预权重矩阵[batch, max_len, 5]
+        :return: 干预后的发射分数[batch, max_len, 5]
+        """
+        raise UnSupportedException()
+
+    def transitions(self):
+        """
+        获取CRF转移矩阵
+        :return: 转移分数[5, 5]
+        """
+        raise UnSupportedException()
+
+
+def find_crf_tensors(graph, factor_input, tag_ids, num_tags=len(Tag)):
+    """
+    在计算图中查找干预前的发射分数、干预后输入CRF的发射分数和转移矩阵，config中指定了张量名称时直接使用：
+    第一个同时以干预矩阵（或由其计算得到的张量）和另一个[batch, max_len, num_tags]张量为输入的算子处开始干预，
+    干预前的发射分数为该算子不依赖干预矩阵的输入，干预后的发射分数为从该算子沿逐元素运算得到的最后一个同形状张量，
+    转移矩阵为标签输出依赖的[num_tags, num_tags]浮点张量
+    :param graph: 计算图
+    :param factor_input: 干预权重矩阵输入
+    :param tag_ids: 标签输出
+    :param num_tags: 标签数量
+    :return: 干预前的发射分数张量, 干预后的发射分数张量, 转移矩阵张量
+    """
+    def has_shape(tensor, shape):
+        return tensor.dtype.is_floating and tensor.shape.ndims == len(shape) and \
+            all(s is None or d == s for d, s in zip(tensor.shape.as_list(), shape))
+
+    def get_tensor(key):
+        return graph.get_tensor_by_name(configs['crf'][key]) if configs['crf'][key] else None
+
+    emission, crf_input, transition = get_tensor('emission_tensor'), get_tensor('crf_input_tensor'), \
+        get_tensor('transition_tensor')
+    combine_op = None
+    factor_derived = {factor_input.name}
+    queue = collections.deque(factor_input.consumers())
+    while (emission is None or crf_input is None) and queue:
+        op = queue.popleft()
+        others = [tensor for tensor in op.inputs
+                  if tensor.name not in factor_derived and has_shape(tensor, [None, None, num_tags])]
+        if others and op.outputs and has_shape(op.outputs[0], [None, None, num_tags]):
+            emission = others[0] if emission is None else emission
+            combine_op = op
+            break
+        for tensor in op.outputs:
+            if tensor.name not in factor_derived:
+                factor_derived.add(tensor.name)
+                queue.extend(tensor.consumers())
+    if crf_input is None and combine_op is not None:
+        crf_input = combine_op.outputs[0]
+        while True:
+            # 干预可能由多个逐元素运算组成，如logits * (1 + factor)、logits + logits * factor
+            following = [op for op in crf_input.consumers()
+                         if op.type in ELEMENTWISE_OPS and has_shape(op.outputs[0], [None, None, num_tags])]
+            if len(following) != 1:
+                break
+            crf_input = following[0].outputs[0]
+    visited = set()
+    queue = collections.deque([tag_ids.op])
+    while transition is None and queue:
+        for tensor in queue.popleft().inputs:
+            if has_shape(tensor, [num_tags, num_tags]):
+                transition = tensor
+                break
+            if tensor.op.name not in visited:
+                visited.add(tensor.op.name)
+                queue.append(tensor.op)
+    if emission is None or crf_input is None or transition is None:
+        raise UnSupportedException()
+    return emission, crf_input, transition
+
+
+class TFSessionBackend(InferenceBackend):
+    def __init__(self, model_path, intra_op_threads=0, inter_op_threads=0):
+        """
+        基于TensorFlow Session加载pb模型
+        :param model_path: pb模型路径
+        :param intra_op_threads: 单个算子内部的并行线程数，0表示由TensorFlow决定
+        :param inter_op_threads: 算子之间的并行线程数，0表示由TensorFlow决定
+        """
+        start = time.perf_counter()
+        import tensorflow as tf
+        load_stats.setdefault('tensorflow_import', time.perf_counter() - start)
+        with tf.io.gfile.GFile(model_path, 'rb') as f:
+            graph_def = tf.compat.v1.GraphDef()
+            graph_def.ParseFromString(f.read())
+        g = tf.Graph()
+        with g.as_default():
+            tf.import_graph_def(graph_def, name='')
+        tf_config = tf.compat.v1.ConfigProto(intra_op_parallelism_threads=intra_op_threads,
+                                             inter_op_parallelism_threads=inter_op_threads)
+        tf_config.gpu_options.allow_growth = True  # 使用过程中动态申请显存，按需分配
+        self.sess = tf.compat.v1.Session(graph=g, config=tf_config)
+        self.char_ids_input = g.get_tensor_by_name(CHAR_IDS_INPUT)
+        self.factor_input = g.get_tensor_by_name(FACTOR_INPUT)
+        self.tag_ids = g.get_tensor_by_name(TAG_IDS_OUTPUT)
+        self.char_ids_dtype = self.char_ids_input.dtype.as_numpy_dtype
+        self.factor_dtype = self.factor_input.dtype.as_numpy_dtype
+        self._crf = None
+        self._transitions = None
+
+    def predict(self, char_ids, factor):
+        feed_dict = {
+            self.char_ids_input: char_ids,
+            self.factor_input: factor
+        }
+        return self.sess.run(self.tag_ids, feed_dict=feed_dict)
+
+    def emissions(self, char_ids):
+        emission, _, _ = self._crf_tensors()
+        return self.sess.run(emission, feed_dict={self.char_ids_input: char_ids})
+
+    def interfere(self, char_ids, emissions, factor):
+        emission, crf_input, _ = self._crf_tensors()
+        # 以缓存的发射分数代替模型计算，只执行计算图中的干预运算
+        feed_dict = {
+            self.char_ids_input: char_ids,
+            emission: emissions,
+            self.factor_input: factor
+        }
+        return self.sess.run(crf_input, feed_dict=feed_dict)
+
+    def transitions(self):
+        if self._transitions is None:
+            _, _, transition = self._crf_tensors()
+            self._transitions = self.sess.run(transition)
+        return self._transitions
+
+    def _crf_tensors(self):
+        if self._crf is None:
+            crf = find_crf_tensors(self.sess.graph, self.factor_input, self.tag_ids)
+            self._check_parity(crf)
+            self._crf = crf
+        return self._crf
+
+    def _check_parity(self, crf):
+        """
+        在探测batch上比较Python侧解码与模型内解码的结果，不一致时说明找到的张量有误，抛出UnSupportedException
+        :param crf: find_crf_tensors的返回值
+        """
+        emission, crf_input, transition = crf
+        char_ids = (np.arange(32).reshape(2, 16) % 13 + 1).astype(self.char_ids_dtype)
+        factor = np.zeros(char_ids.shape + (len(Tag),), dtype=self.factor_dtype)
+        factor[0, 2, Tag.B.value] = factor[0, 3, Tag.M.value] = factor[0, 4, Tag.E.value] = 2
+        factor[1, 7, Tag.S.value] = 2
+        emissions = self.sess.run(emission, feed_dict={self.char_ids_input: char_ids})
+        scores = self.sess.run(crf_input, feed_dict={self.char_ids_input: char_ids, emission: emissions,
+                                                     self.factor_input: factor})
+        tags = viterbi_decode(scores, self.sess.run(transition), [char_ids.shape[1]] * len(char_ids))
+        if not np.array_equal(tags, self.predict(char_ids, factor)):
+            raise UnSupportedException()
+
+
+_ONNX_DTYPES = {
+    'tensor(int32)': np.int32,
+    'tensor(int64)': np.int64,
+    'tensor(float)': np.float32,
+    'tensor(double)': np.float64,
+}
+
+
+class ONNXRuntimeBackend(InferenceBackend):
+    def __init__(self, model_path, intra_op_threads=0, inter_op_threads=0):
+        """
+        基于ONNX Runtime加载由export_onnx转换的模型，只依赖onnxruntime，不需要TensorFlow
+        :param model_path: onnx模型路径
+        :param intra_op_threads: 单个算子内部的并行线程数，0表示由ONNX Runtime决定
+        :param inter_op_threads: 算子之间的并行线程数，0表示由ONNX Runtime决定
+        """
+        start = time.perf_counter()
+        import onnxruntime
+        load_stats.setdefault('onnxruntime_import', time.perf_counter() - start)
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = intra_op_threads
+        options.inter_op_num_threads = inter_op_threads
+        self.session = onnxruntime.InferenceSession(model_path, options, providers=['CPUExecutionProvider'])
+        inputs = {node.name: node for node in self.session.get_inputs()}
+        self.char_ids_dtype = _ONNX_DTYPES[inputs[CHAR_IDS_INPUT].type]
+        self.factor_dtype = _ONNX_DTYPES[inputs[FACTOR_INPUT].type]
+
+    def predict(self, char_ids, factor):
+        feed_dict = {
+            CHAR_IDS_INPUT: char_ids,
+            FACTOR_INPUT: factor
+        }
+        return self.session.run([TAG_IDS_OUTPUT], feed_dict)[0]
+
+
+BACKENDS = {
+    'tf': (TFSessionBackend, 'model'),
+    'onnx': (ONNXRuntimeBackend, 'onnx_model'),
+}
+
+
+def get_backend(name, granularity, intra_op_threads=0, inter_op_threads=0):
+    """
+    获取推理后端，相同配置的后端在进程内共享
+    :param name: 后端名称，tf或onnx
+    :param granularity: 分词粒度，fine或coarse
+    :param intra_op_threads: 单个算子内部的并行线程数
+    :param inter_op_threads: 算子之间的并行线程数
+    :return: 推理后端
+    """
+    if name not in BACKENDS:
+        raise UnSupportedException()
+    key = (name, granularity, intra_op_threads, inter_op_threads)
+    backend = _backends.get(key)
+    if backend is None:
+        with _backend_lock:
+            backend = _backends.get(key)
+            if backend is None:
+                start = time.perf_counter()
+                backend_class, model_key = BACKENDS[name]
+                model_path = os.path.join(pwd, configs['tokenizer_granularity'][granularity][model_key])
+                backend = backend_class(model_path, intra_op_threads, inter_op_threads)
+                _backends[key] = backend
+                load_stats[key] = time.perf_counter() - start
+    return backend
+
+
+def export_onnx(granularity, output_path=None, opset=13):
+    """
+    将pb模型转换为onnx模型，需要安装tensorflow和tf2onnx
+    :param granularity: 分词粒度，fine或coarse
+    :param output_path: onnx模型保存路径，默认保存到config中onnx_model对应的位置（~/.cache/minlptokenizer/onnx），
+                        ONNX Runtime后端从该位置加载模型
+    :param opset: onnx算子集版本
+    :return: onnx模型保存路径
+    """
+    import tensorflow as tf
+    import tf2onnx
+    model_config = configs['tokenizer_granularity'][granularity]
+    output_path = output_path or os.path.join(pwd, model_config['onnx_model'])
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    with tf.io.gfile.GFile(os.path.join(pwd, model_config['model']), 'rb') as f:
+        graph_def = tf.compat.v1.GraphDef()
+        graph_def.ParseFromString(f.read())
+    tf2onnx.convert.from_graph_def(graph_def, input_names=[CHAR_IDS_INPUT, FACTOR_INPUT],
+                                   output_names=[TAG_IDS_OUTPUT], opset=opset, output_path=output_path)
+    return output_path
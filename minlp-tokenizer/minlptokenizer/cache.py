@@ -0,0 +1,114 @@
+# Copyright 2020 The MiNLP Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import collections
+import threading
+import time
+
+
+class LRUCache:
+    def __init__(self, max_size, ttl=None):
+        """
+        线程安全的LRU缓存，支持过期时间
+        :param max_size: 最大缓存条数
+        :param ttl: 过期时间（秒），为None时不过期
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __reduce__(self):
+        # 传递到其他进程时只保留配置，不复制缓存内容
+        return self.__class__, (self.max_size, self.ttl)
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        """
+        查询缓存，命中时将其移动到最近使用位置
+        :param key: 缓存键
+        :param default: 未命中时的返回值
+        :return: 缓存值
+        """
+        with self._lock:
+            item = self._lookup(key)
+            if item is None:
+                self.misses += 1
+                return default
+            self.hits += 1
+            return item[0]
+
+    def get_many(self, keys):
+        """
+        批量查询，同一批中重复的未命中键只计一次未命中，其余计为命中，与只计算一次的实际情况一致
+        :param keys: 缓存键列表
+        :return: 缓存值列表，未命中的位置为None
+        """
+        results = []
+        missed = set()
+        with self._lock:
+            for key in keys:
+                item = self._lookup(key)
+                if item is None and key not in missed:
+                    missed.add(key)
+                    self.misses += 1
+                else:
+                    self.hits += 1
+                results.append(None if item is None else item[0])
+        return results
+
+    def _lookup(self, key):
+        """
+        查询缓存并更新最近使用位置，删除过期条目，调用时需持有锁
+        :return: (缓存值, 过期时间)，未命中时返回None
+        """
+        item = self._data.get(key)
+        if item is not None and self.ttl is not None and item[1] < time.monotonic():
+            del self._data[key]
+            return None
+        if item is not None:
+            self._data.move_to_end(key)
+        return item
+
+    def put(self, key, value):
+        """
+        写入缓存，超过容量时淘汰最久未使用的条目
+        :param key: 缓存键
+        :param value: 缓存值
+        """
+        expire_time = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            self._data[key] = (value, expire_time)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        """
+        清空缓存
+        """
+        with self._lock:
+            self._data.clear()
+
+    def info(self):
+        """
+        缓存统计信息
+        :return: 命中数、未命中数、当前条数和最大条数
+        """
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self._data), 'max_size': self.max_size}
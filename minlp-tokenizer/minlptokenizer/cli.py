@@ -0,0 +1,325 @@
+# Copyright 2020 The MiNLP Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import io
+import sys
+import gzip
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import multiprocessing
+from minlptokenizer.config import configs
+from minlptokenizer.tokenizer import MiNLPTokenizer
+from minlptokenizer.autotune import load_profile
+
+OUTPUT_FORMATS = ('text', 'jsonl', 'offsets')
+PARTS_SUFFIX = '.minlp-parts'
+
+_cli_tokenizer = None
+_cli_error = None
+
+
+def _init_cli_worker(granularity, user_dict, profile=None):
+    """
+    worker初始化：每个进程加载一次分词器，调优配置中的推理后端线程数为每个进程的线程数。
+    加载失败时保存异常，在处理第一个分片时抛出，避免进程池不断重建worker
+    """
+    global _cli_tokenizer, _cli_error
+    try:
+        _cli_tokenizer = MiNLPTokenizer(user_dict, granularity=granularity, profile=profile)
+        _cli_tokenizer.warmup()
+    except Exception as e:
+        _cli_error = e
+
+
+def list_inputs(paths):
+    """
+    展开输入路径，目录中的文件按路径排序
+    :param paths: 文件或目录列表
+    :return: [(输入文件路径, 相对路径)]
+    """
+    inputs = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    file_path = os.path.join(root, name)
+                    inputs.append((file_path, os.path.relpath(file_path, path)))
+        else:
+            inputs.append((path, os.path.basename(path)))
+    return inputs
+
+
+def plan_shards(file_path, shard_size):
+    """
+    按字节区间切分文件，gz文件无法随机读取，整个文件为一个分片
+    :param file_path: 文件路径
+    :param shard_size: 分片字节数
+    :return: [(start, end)]，end为None表示读到文件末尾
+    """
+    if file_path.endswith('.gz'):
+        return [(0, None)]
+    size = os.path.getsize(file_path)
+    return [(start, min(start + shard_size, size)) for start in range(0, size, shard_size)] or [(0, 0)]
+
+
+def read_shard(file_path, start, end):
+    """
+    读取分片中的行：起始位置落在[start, end)内的行属于该分片，相邻分片不重复、不遗漏
+    :param file_path: 文件路径
+    :param start: 起始字节
+    :param end: 结束字节，为None时读到文件末尾
+    :return: 行迭代器，不含换行符
+    """
+    if end is None:
+        with gzip.open(file_path, 'rb') if file_path.endswith('.gz') else open(file_path, 'rb') as fin:
+            for line in fin:
+                yield line.decode('UTF-8').rstrip('\r\n')
+        return
+    with open(file_path, 'rb') as fin:
+        pos = start
+        if start > 0:
+            fin.seek(start - 1)
+            pos = start - 1 + len(fin.readline())  # 跳过上一个分片中的行
+        while pos < end:
+            line = fin.readline()
+            if not line:
+                break
+            pos += len(line)
+            yield line.decode('UTF-8').rstrip('\r\n')
+
+
+def format_result(line, result, output_format):
+    """
+    将一行的分词结果格式化为输出行
+    :param line: 输入行
+    :param result: 分词结果，offsets格式时为区间数组
+    :param output_format: 输出格式
+    :return: 输出行，不含换行符
+    """
+    if output_format == 'text':
+        return ' '.join(result)
+    if output_format == 'jsonl':
+        return json.dumps({'text': line, 'tokens': result}, ensure_ascii=False)
+    return json.dumps(result.tolist() if len(result) else [])
+
+
+def tokenize_lines(tokenizer, lines, output_format):
+    """
+    批量分词，空行输出空结果，超过最大长度的行按长文本模式分词
+    :param tokenizer: 分词器
+    :param lines: 行列表
+    :param output_format: 输出格式
+    :return: 输出行列表
+    """
+    cut = tokenizer.cut_spans if output_format == 'offsets' else tokenizer.cut
+    max_length = configs['tokenizer_limit']['max_string_length']
+    results = [[] for _ in lines]
+    short = [idx for idx, line in enumerate(lines) if line.strip() and len(line) <= max_length]
+    long = [idx for idx, line in enumerate(lines) if line.strip() and len(line) > max_length]
+    for indices, split_long_text in ((short, False), (long, True)):
+        if indices:
+            for idx, result in zip(indices, cut([lines[idx] for idx in indices], split_long_text=split_long_text)):
+                results[idx] = result
+    return [format_result(line, result, output_format) for line, result in zip(lines, results)]
+
+
+def _process_shard(task):
+    """
+    worker中处理一个分片，结果先写入临时文件，完成后改名，中断后重新运行时可跳过已完成的分片
+    :param task: (文件路径, 起始字节, 结束字节, 分片结果路径, 输出格式, batch大小)
+    :return: 分片结果路径, 行数, 字符数
+    """
+    if _cli_error is not None:
+        raise _cli_error
+    file_path, start, end, part_path, output_format, batch_size = task
+    lines = chars = 0
+    with io.open(part_path + '.tmp', 'w', encoding='UTF-8') as fout:
+        batch = []
+        for line in read_shard(file_path, start, end):
+            batch.append(line)
+            if len(batch) == batch_size:
+                fout.write(''.join(out + '\n' for out in tokenize_lines(_cli_tokenizer, batch, output_format)))
+                lines += len(batch)
+                chars += sum(map(len, batch))
+                batch = []
+        if batch:
+            fout.write(''.join(out + '\n' for out in tokenize_lines(_cli_tokenizer, batch, output_format)))
+            lines += len(batch)
+            chars += sum(map(len, batch))
+    os.replace(part_path + '.tmp', part_path)
+    return part_path, lines, chars
+
+
+class Progress:
+    def __init__(self, total_shards, total_bytes, enabled=True):
+        """
+        进度与吞吐量输出到stderr
+        :param total_shards: 分片总数
+        :param total_bytes: 输入总字节数（gz文件为压缩后大小）
+        :param enabled: 是否输出
+        """
+        self.total_shards = total_shards
+        self.total_bytes = total_bytes
+        self.enabled = enabled
+        self.shards = self.lines = self.chars = self.bytes = 0
+        self.start = time.perf_counter()
+
+    def update(self, shard_bytes, lines=0, chars=0):
+        self.shards += 1
+        self.bytes += shard_bytes
+        self.lines += lines
+        self.chars += chars
+        if self.enabled:
+            elapsed = max(time.perf_counter() - self.start, 1e-9)
+            sys.stderr.write('\r[minlp-tokenize] shards %d/%d, %.1f%% bytes, %d lines, %.2f MB/s, %.0f chars/s' % (
+                self.shards, self.total_shards, 100.0 * self.bytes / max(self.total_bytes, 1), self.lines,
+                self.bytes / elapsed / (1 << 20), self.chars / elapsed))
+            sys.stderr.flush()
+
+    def close(self):
+        if self.enabled:
+            sys.stderr.write('\n')
+            sys.stderr.flush()
+
+
+def output_path_of(output, relative_path, single):
+    """
+    输出文件路径：单个输入时output为文件，多个输入时output为目录，保持输入的相对路径，去掉.gz后缀
+    """
+    if single:
+        return output
+    if relative_path.endswith('.gz'):
+        relative_path = relative_path[:-len('.gz')]
+    return os.path.join(output, relative_path)
+
+
+def run(args):
+    """
+    执行批量分词
+    :param args: 命令行参数
+    """
+    inputs = list_inputs(args.inputs)
+    if not inputs:
+        raise SystemExit('minlp-tokenize: no input files')
+    for path in args.inputs:
+        if not os.path.exists(path):
+            raise SystemExit('minlp-tokenize: no such file or directory: %s' % path)
+    try:
+        # 在父进程中检查用户词典，只构建词典不加载模型，worker仍在fork后加载模型
+        MiNLPTokenizer(args.user_dict, granularity=args.granularity)._get_lexicon()
+    except Exception as e:
+        raise SystemExit('minlp-tokenize: failed to load user dict: %s' % e)
+    single = len(inputs) == 1 and not os.path.isdir(args.inputs[0])
+    if args.output is None and (not single or args.resume):
+        raise SystemExit('minlp-tokenize: --output is required for multiple inputs or --resume')
+    output = args.output if args.output is not None else os.path.join(tempfile.mkdtemp(), 'output')
+    files = []  # (输出路径, 分片目录, 分片列表)
+    tasks = []
+    total_bytes = 0
+    for file_path, relative_path in inputs:
+        out_path = output_path_of(output, relative_path, single)
+        parts_dir = out_path + PARTS_SUFFIX
+        if not args.resume and os.path.isdir(parts_dir):
+            shutil.rmtree(parts_dir)
+        os.makedirs(parts_dir, exist_ok=True)
+        shards = plan_shards(file_path, args.shard_size << 20)
+        parts = []
+        for shard_id, (start, end) in enumerate(shards):
+            part_path = os.path.join(parts_dir, 'part-%06d' % shard_id)
+            shard_bytes = (end if end is not None else os.path.getsize(file_path)) - start
+            total_bytes += shard_bytes
+            parts.append((part_path, shard_bytes))
+            tasks.append((file_path, start, end, part_path, args.format, args.batch_size))
+        files.append((out_path, parts_dir, parts))
+    part_bytes = dict(part for _, _, parts in files for part in parts)
+    pending = [task for task in tasks if not os.path.exists(task[3])]
+    progress = Progress(len(tasks), total_bytes, enabled=not args.quiet)
+    for part_path in set(part_bytes) - set(task[3] for task in pending):
+        progress.update(part_bytes[part_path])  # 断点续跑时已完成的分片
+    done = set(part_bytes) - set(task[3] for task in pending)
+    merged = set()
+
+    def merge_ready_files():
+        # 一个文件的所有分片完成后，按顺序拼接为输出文件并删除分片目录
+        for out_path, parts_dir, parts in files:
+            if out_path not in merged and all(part_path in done for part_path, _ in parts):
+                if os.path.dirname(out_path):
+                    os.makedirs(os.path.dirname(out_path), exist_ok=True)
+                with open(out_path + '.tmp', 'wb') as fout:
+                    for part_path, _ in parts:
+                        with open(part_path, 'rb') as fin:
+                            shutil.copyfileobj(fin, fout)
+                os.replace(out_path + '.tmp', out_path)
+                shutil.rmtree(parts_dir)
+                merged.add(out_path)
+
+    merge_ready_files()
+    if pending:
+        with multiprocessing.Pool(min(args.jobs, len(pending)), initializer=_init_cli_worker,
+                                  initargs=(args.granularity, args.user_dict, args.profile)) as pool:
+            try:
+                for part_path, lines, chars in pool.imap_unordered(_process_shard, pending):
+                    done.add(part_path)
+                    progress.update(part_bytes[part_path], lines, chars)
+                    merge_ready_files()
+            except Exception as e:
+                progress.close()
+                raise SystemExit('minlp-tokenize: %s: %s' % (type(e).__name__, e))
+    progress.close()
+    if args.output is None:
+        with open(output, 'rb') as fin:
+            shutil.copyfileobj(fin, sys.stdout.buffer)
+        shutil.rmtree(os.path.dirname(output))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog='minlp-tokenize', description='MiNLP-Tokenizer批量文件分词')
+    parser.add_argument('inputs', nargs='+', help='UTF-8文本文件或目录，支持.gz文件，每行一条文本')
+    parser.add_argument('-o', '--output', help='输出路径：单个输入文件时为文件，否则为目录；单个输入文件时缺省输出到stdout')
+    parser.add_argument('-f', '--format', default='text', choices=OUTPUT_FORMATS,
+                        help='输出格式：text为空格分隔的词，jsonl为包含原文和词列表的json，offsets为词在原文中的区间')
+    parser.add_argument('-g', '--granularity', default='fine', choices=('fine', 'coarse'), help='分词粒度')
+    parser.add_argument('-u', '--user-dict', help='用户词典文件')
+    parser.add_argument('-j', '--jobs', type=int, help='进程数，默认使用调优配置中的进程数，未使用调优配置时为CPU核数')
+    parser.add_argument('--shard-size', type=int, default=64, help='分片大小（MB），每个分片由一个进程处理')
+    parser.add_argument('--batch-size', type=int, help='每次分词的行数，默认使用调优配置中的batch大小')
+    parser.add_argument('--profile', nargs='?', const=True,
+                        help='应用minlp-autotune生成的调优配置，不指定路径时使用默认路径')
+    parser.add_argument('--resume', action='store_true', help='保留上次中断时已完成的分片，只处理剩余分片')
+    parser.add_argument('-q', '--quiet', action='store_true', help='不输出进度')
+    args = parser.parse_args(argv)
+    tuned = load_profile(args.profile, granularity=args.granularity) if args.profile is not None else {}
+    n_jobs = tuned.pop('n_jobs', multiprocessing.cpu_count())  # 分片已由多个进程并行处理，worker内的分词器不再创建进程池
+    if args.profile is not None:
+        args.profile = tuned
+    if args.jobs is None:
+        args.jobs = n_jobs
+    if args.batch_size is None:
+        args.batch_size = tuned.get('max_batch_size', configs['tokenizer_limit']['max_batch_size'])
+    if args.jobs <= 0 or args.shard_size <= 0 or args.batch_size <= 0:
+        parser.error('--jobs, --shard-size and --batch-size must be positive')
+    return args
+
+
+def main(argv=None):
+    run(parse_args(argv))
+
+
+if __name__ == '__main__':
+    main()
@@ -12,23 +12,55 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import os
 
 configs = {
     'vocab_path': 'vocab/b.14067n.300d.vocab',
     'tokenizer_granularity': {
         'fine': {
             'model': 'model/zh/b-fine-cnn-crf-an2cn.pb',
+            # 由backend.export_onnx转换生成，保存在用户缓存目录中，不写入安装目录
+            'onnx_model': os.path.join(os.path.expanduser('~'), '.cache', 'minlptokenizer', 'onnx',
+                                       'b-fine-cnn-crf-an2cn.onnx'),
         },
         'coarse': {
             'model': 'model/zh/b-coarse-cnn-crf-an2cn.pb',
+            'onnx_model': os.path.join(os.path.expanduser('~'), '.cache', 'minlptokenizer', 'onnx',
+                                       'b-coarse-cnn-crf-an2cn.onnx'),
         }
     },
     'tokenizer_limit': {
         'max_batch_size': 128,
-        'max_string_length': 1024
+        'max_batch_tokens': 16384,  # 按长度分桶时，单个batch补齐后的最大字符数
+        'max_string_length': 1024,
+        'document_chunk_length': 256,  # 长文本模式下切分片段的最大长度
+        'max_pending_batches': 2,  # 多进程分词时每个进程最多排队的batch数
+        'max_batch_delay': 0.005,  # 在线合并请求时，batch未满时最多等待的时间（秒）
+        'pipeline_depth': 2  # 流水线分词时预处理和后处理阶段最多排队的batch数
+    },
+    'crf': {
+        # Python侧维特比解码使用的发射分数和转移矩阵张量名称，为None时自动在计算图中查找
+        'emission_tensor': None,  # 干预前的发射分数
+        'crf_input_tensor': None,  # 干预后输入CRF的发射分数
+        'transition_tensor': None
     },
     'lexicon_files': [
         'lexicon/default.txt',
         'lexicon/chengyu.txt',
-    ]
+    ],
+    'lexicon_merge_threshold': 10000,  # 用户词典增量词数达到该值时合并重建
+    'lexicon_cache_dir': os.path.join(os.path.expanduser('~'), '.cache', 'minlptokenizer', 'lexicon'),
+    'lexicon_registry_max_memory': 1 << 30,  # 多租户词典注册表中已加载词典的内存上限（字节）
+    'autotune': {
+        'profile_path': os.path.join(os.path.expanduser('~'), '.cache', 'minlptokenizer', 'profile.json'),
+        'batch_sizes': [16, 32, 64, 128],  # 搜索的batch大小，不超过max_batch_size
+        'sample_size': 2000  # 从语料中抽样的句子数
+    },
+    'server': {
+        'host': '127.0.0.1',
+        'port': 8080,
+        'max_queue_size': 4096,  # 每个分词引擎排队的句子数上限，超过时返回503
+        'max_body_size': 16 << 20,  # 请求体最大字节数
+        'max_stream_pending': 256  # 流式接口中每个连接最多未返回的句子数
+    }
 }
@@ -0,0 +1,52 @@
+# Copyright 2020 The MiNLP Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import numpy as np
+from minlptokenizer.tag import Tag
+
+
+def viterbi_decode(emissions, transitions, lengths, allowed=None):
+    """
+    批量维特比解码，与模型内的CRF解码结果一致
+    :param emissions: 发射分数[batch, max_len, num_tags]
+    :param transitions: 转移分数[num_tags, num_tags]，transitions[i, j]为标签i转移到标签j的分数
+    :param lengths: 每个句子的实际长度[batch]
+    :param allowed: 可选的约束矩阵[batch, max_len, num_tags]，为False的标签不会出现在解码结果中
+    :return: 标签矩阵[batch, max_len]，padding位置为Tag.X
+    """
+    emissions = np.asarray(emissions, dtype=np.float64)
+    lengths = np.asarray(lengths)
+    if allowed is not None:
+        emissions = np.where(allowed, emissions, -np.inf)
+    batch_size, max_len, num_tags = emissions.shape
+    identity = np.broadcast_to(np.arange(num_tags), (batch_size, num_tags))
+    backpointers = np.empty((batch_size, max_len, num_tags), dtype=np.int64)
+    backpointers[:, 0] = identity
+    score = emissions[:, 0]
+    for t in range(1, max_len):
+        candidates = score[:, :, np.newaxis] + transitions[np.newaxis]  # [batch, from, to]
+        best_prev = candidates.argmax(axis=1)
+        active = (t < lengths)[:, np.newaxis]
+        # 超出句子长度的位置保持分数不变，回溯指针指向自身
+        score = np.where(active, candidates.max(axis=1) + emissions[:, t], score)
+        backpointers[:, t] = np.where(active, best_prev, identity)
+    tags = np.empty((batch_size, max_len), dtype=np.int32)
+    tag = score.argmax(axis=1)
+    rows = np.arange(batch_size)
+    for t in range(max_len - 1, -1, -1):
+        tags[:, t] = tag
+        tag = backpointers[rows, t, tag]
+    tags[np.arange(max_len) >= lengths[:, np.newaxis]] = Tag.X.value
+    return tags
@@ -0,0 +1,159 @@
+# Copyright 2020 The MiNLP Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from minlptokenizer.config import configs
+from minlptokenizer.exception import UnSupportedException
+from minlptokenizer.tokenizer import format_string
+
+_STOP = object()
+
+
+class BatchingEngine:
+    def __init__(self, tokenizer, max_batch_size=configs['tokenizer_limit']['max_batch_size'],
+                 max_batch_delay=configs['tokenizer_limit']['max_batch_delay'], max_queue_size=0):
+        """
+        在线分词引擎：后台线程合并多个线程提交的请求，batch达到大小或等待超时后统一进行一次模型预测
+        :param tokenizer: 分词器
+        :param max_batch_size: 合并后batch的最大句子数
+        :param max_batch_delay: 第一个请求到达后最多等待的时间（秒）
+        :param max_queue_size: 排队请求数上限，超过时submit阻塞，默认为0，不限制
+        """
+        self.tokenizer = tokenizer
+        self.max_batch_size = max_batch_size
+        self.max_batch_delay = max_batch_delay
+        self._queue = queue.Queue(max_queue_size)
+        self._thread = threading.Thread(target=self._loop, name='minlp-batching-engine', daemon=True)
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        """
+        处理完已提交的请求后停止后台线程
+        """
+        if self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join()
+
+    def queue_size(self):
+        """
+        :return: 排队等待合并的请求数
+        """
+        return self._queue.qsize()
+
+    def submit(self, text, block=True, timeout=None, lexicon_id=None):
+        """
+        提交单条文本，格式不合法或词典ID未注册时直接抛出异常
+        :param text: 待分词字符串
+        :param block: 排队已满时是否阻塞等待
+        :param timeout: 阻塞等待的超时时间（秒），超时抛出queue.Full
+        :param lexicon_id: 词典ID，从分词器的词典注册表中获取用户词典，默认为None，使用分词器自己的用户词典，
+                           使用不同词典的请求可以合并在同一个batch中
+        :return: Future，结果为分词结果
+        """
+        text = format_string(text)
+        if lexicon_id is not None and not self.tokenizer._has_lexicon(lexicon_id):
+            raise UnSupportedException()  # 提交线程中只检查词典是否注册，词典在后台线程中加载
+        future = Future()
+        self._queue.put((text, lexicon_id, future), block, timeout)
+        return future
+
+    def cut(self, text_or_list, timeout=None, lexicon_id=None):
+        """
+        分词函数，阻塞直到结果返回，可在多个线程中并发调用
+        :param text_or_list: 待分词字符串或者字符串列表
+        :param timeout: 等待结果的超时时间（秒）
+        :param lexicon_id: 词典ID
+        :return: 分词结果
+        """
+        if isinstance(text_or_list, str):
+            return self.submit(text_or_list, lexicon_id=lexicon_id).result(timeout)
+        futures = [self.submit(text, lexicon_id=lexicon_id) for text in text_or_list]
+        return [future.result(timeout) for future in futures]
+
+    async def acut(self, text, lexicon_id=None):
+        """
+        asyncio分词函数
+        :param text: 待分词字符串
+        :param lexicon_id: 词典ID
+        :return: 分词结果
+        """
+        return await asyncio.wrap_future(self.submit(text, lexicon_id=lexicon_id))
+
+    def _next_batch(self):
+        """
+        阻塞获取第一个请求，之后在max_batch_delay内尽量凑满batch
+        :return: 请求列表，以及是否收到停止信号
+        """
+        item = self._queue.get()
+        if item is _STOP:
+            return [], True
+        batch = [item]
+        deadline = time.monotonic() + self.max_batch_delay
+        while len(batch) < self.max_batch_size:
+            try:
+                item = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _load_lexicons(self, batch):
+        """
+        在后台线程中加载batch用到的注册表词典，加载失败的词典只使对应的请求失败
+        :param batch: 请求列表
+        :return: 词典加载成功的请求列表
+        """
+        errors = {}
+        for lexicon_id in set(item[1] for item in batch if item[1] is not None):
+            try:
+                self.tokenizer._get_lexicon(lexicon_id)
+            except Exception as e:
+                errors[lexicon_id] = e
+        for text, lexicon_id, future in batch:
+            if lexicon_id in errors:
+                future.set_exception(errors[lexicon_id])
+        return [item for item in batch if item[1] not in errors]
+
+    def _loop(self):
+        stopped = False
+        while not stopped:
+            batch, stopped = self._next_batch()
+            batch = [item for item in batch if item[2].set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            batch = self._load_lexicons(batch)
+            if not batch:
+                continue
+            texts, lexicon_ids, futures = zip(*batch)
+            try:
+                results = self.tokenizer._tokenize(list(texts), lexicon_ids=list(lexicon_ids))
+            except Exception as e:
+                for future in futures:
+                    future.set_exception(e)
+            else:
+                for future, words in zip(futures, results):
+                    future.set_result(words)
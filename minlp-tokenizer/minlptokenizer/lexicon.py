@@ -13,27 +13,186 @@
 # limitations under the License.
 
 import ahocorasick
-from collections import Iterable
+import functools
+import hashlib
+import itertools
+import os
+import pickle
+import threading
+from collections.abc import Iterable
 import numpy as np
+from minlptokenizer.config import configs
 from minlptokenizer.tag import Tag
 
 DEFAULT_INTERFERE_FACTOR = 2
+AUTOMATON_FORMAT_VERSION = b'minlp-automaton-1'
+_automaton_lock = threading.Lock()
+_update_lock = threading.Lock()
+_versions = itertools.count()
+_compiled_automata = {}  # 进程内共享的已编译词典：内容哈希 -> 自动机
+
+
+@functools.lru_cache(maxsize=None)
+def ahocorasick_version():
+    """
+    pyahocorasick的版本，不同版本保存的自动机文件可能不兼容，作为已编译词典哈希的一部分；
+    无法读取版本时使用扩展模块文件的大小和修改时间
+    :return: 版本字符串
+    """
+    try:
+        from importlib.metadata import version
+        return version('pyahocorasick')
+    except Exception:
+        stat = os.stat(ahocorasick.__file__)
+        return '%s:%d:%d' % (os.path.basename(ahocorasick.__file__), stat.st_size, int(stat.st_mtime))
+
+
+def read_words(file_path):
+    """
+    读取词典文件，忽略空行和#开头的注释行
+    :param file_path: 词典文件路径
+    :return: 词列表
+    """
+    with open(file_path, encoding="UTF-8") as fin:
+        return [word for word in fin.read().splitlines() if word and not word.startswith('#')]
+
+
+def lexicon_digest(file_paths):
+    """
+    根据词典文件内容计算哈希值，作为已编译词典的键
+    :param file_paths: 词典文件路径列表
+    :return: 十六进制哈希值
+    """
+    sha1 = hashlib.sha1(AUTOMATON_FORMAT_VERSION)
+    sha1.update(ahocorasick_version().encode('UTF-8') + b'\0')
+    for file_path in file_paths:
+        with open(file_path, 'rb') as fin:
+            sha1.update(fin.read())
+        sha1.update(b'\0')
+    return sha1.hexdigest()
+
+
+def load_compiled_automaton(file_paths, cache_dir=configs['lexicon_cache_dir']):
+    """
+    加载词典文件编译得到的只读自动机：相同内容的词典在进程内只保留一份，
+    首次编译后以内容哈希为文件名保存到cache_dir，其他进程直接加载，无需重新逐行构建
+    :param file_paths: 词典文件路径列表
+    :param cache_dir: 已编译词典的磁盘缓存目录，为None时不使用磁盘缓存
+    :return: 内容哈希, 自动机
+    """
+    digest = lexicon_digest(file_paths)
+    with _automaton_lock:
+        ac = _compiled_automata.get(digest)
+        if ac is None:
+            cache_path = os.path.join(cache_dir, digest + '.ac') if cache_dir else None
+            if cache_path and os.path.exists(cache_path):
+                ac = _load_automaton(cache_path)
+            if ac is None:
+                ac = ahocorasick.Automaton(ahocorasick.STORE_LENGTH)
+                for word in itertools.chain.from_iterable(map(read_words, file_paths)):
+                    ac.add_word(word)
+                ac.make_automaton()
+                if cache_path:
+                    _save_automaton(ac, cache_path)
+            _compiled_automata[digest] = ac
+    return digest, ac
+
+
+def _load_automaton(cache_path):
+    """
+    加载磁盘缓存中的自动机，文件不完整或损坏时删除该文件，返回None以便重新编译
+    """
+    try:
+        return ahocorasick.load(cache_path, pickle.loads)
+    except Exception:
+        try:
+            os.remove(cache_path)
+        except OSError:
+            pass
+        return None
+
+
+def _save_automaton(ac, cache_path):
+    """
+    先写临时文件再重命名，避免多个进程同时写入时读到不完整的文件；目录不可写时跳过
+    """
+    tmp_path = '%s.%d.tmp' % (cache_path, os.getpid())
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        ac.save(tmp_path)
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def build_automaton(words):
+    """
+    根据词集合构建自动机
+    :param words: 词集合
+    :return: 自动机，词集合为空时返回None
+    """
+    if not words:
+        return None
+    ac = ahocorasick.Automaton(ahocorasick.STORE_LENGTH)
+    for word in words:
+        ac.add_word(word)
+    ac.make_automaton()
+    return ac
 
 
 class Lexicon:
-    def __init__(self, file_or_list=None):
-        self.ac = ahocorasick.Automaton(ahocorasick.STORE_LENGTH)
+    def __init__(self, file_or_list=None, cache_dir=configs['lexicon_cache_dir'],
+                 merge_threshold=configs['lexicon_merge_threshold']):
+        """
+        用户词典：词典文件编译为只读共享的自动机；词列表合并为实例自己的自动机，
+        之后增删的词记录在增量中，增量超过merge_threshold时才合并重建，更新代价与变化量相关
+        :param file_or_list: 用户词典文件路径或者词列表
+        :param cache_dir: 已编译词典的磁盘缓存目录
+        :param merge_threshold: 增量词数达到该值时合并到实例自动机
+        """
+        self.cache_dir = cache_dir
+        self.merge_threshold = merge_threshold
+        self.layers = []  # 已编译的词典文件：(文件路径列表, 内容哈希, 自动机)
+        self.ac = None  # 合并后的实例词典自动机
+        self.added_words = set()  # 增量：新增的词
+        self.removed_words = set()  # 增量：从已编译词典或实例自动机中删除的词
+        self.version = next(_versions)  # 词典或干预权重每次变化时更新，用于使分词结果缓存失效
+        self._matchers = None  # 匹配用的只读快照：(自动机列表, 删除词集合)，词典变化时置空
         if file_or_list:
             self.add_words(file_or_list)
         self.interfere_factor = DEFAULT_INTERFERE_FACTOR
 
+    def __getstate__(self):
+        # 已编译的词典不随对象序列化，在其他进程中按文件路径从进程内共享或磁盘缓存加载
+        state = self.__dict__.copy()
+        state['layers'] = [(file_paths, digest, None) for file_paths, digest, _ in self.layers]
+        state['_matchers'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.layers = [(file_paths,) + load_compiled_automaton(file_paths, self.cache_dir)
+                       for file_paths, _, _ in self.layers]
+
+    def __contains__(self, word):
+        automata, removed_words = self.make_automaton()
+        return word not in removed_words and any(word in ac for ac in automata)
+
+    def _in_base(self, word):
+        return any(word in ac for _, _, ac in self.layers) or (self.ac is not None and word in self.ac)
+
+    def _changed(self):
+        self._matchers = None
+        self.version = next(_versions)
+
     def add_word(self, word):
         """
         添加干预词到用户词典中
         :param word: 干预词
         :return:
         """
-        self.ac.add_word(word)
+        self.add_words([word])
 
     def add_words(self, file_or_list):
         """
@@ -42,35 +201,148 @@ class Lexicon:
         :return:
         """
         if isinstance(file_or_list, str):  # param is a filename
-            with open(file_or_list, encoding="UTF-8") as fin:
-                lines = fin.read().splitlines()
-                self.add_words(lines)
+            self.add_files([file_or_list])
         elif isinstance(file_or_list, Iterable):  # param is a iterable type
-            for word in filter(lambda t: t and not t.startswith('#'), file_or_list):
-                self.ac.add_word(word)
+            with _update_lock:
+                for word in filter(lambda t: t and not t.startswith('#'), file_or_list):
+                    if word in self.removed_words:
+                        self.removed_words.discard(word)
+                    elif not self._in_base(word):
+                        self.added_words.add(word)
+                if len(self.added_words) >= self.merge_threshold:
+                    self._merge()
+                self._changed()
+
+    def add_files(self, file_paths):
+        """
+        添加词典文件，多个文件合并编译为一个共享的自动机
+        :param file_paths: 词典文件路径列表
+        :return:
+        """
+        file_paths = list(file_paths)
+        layer = (file_paths,) + load_compiled_automaton(file_paths, self.cache_dir)
+        with _update_lock:
+            self.layers.append(layer)
+            self._changed()
+
+    def remove_word(self, word):
+        """
+        从用户词典中删除干预词
+        :param word: 干预词
+        :return:
+        """
+        self.remove_words([word])
+
+    def remove_words(self, file_or_list):
+        """
+        从用户词典中删除词典文件中的词或者词列表，与add_words一致，字符串参数为文件路径
+        :param file_or_list: 文件路径或者词列表
+        :return:
+        """
+        words = read_words(file_or_list) if isinstance(file_or_list, str) else file_or_list
+        with _update_lock:
+            for word in words:
+                self.added_words.discard(word)
+                if self._in_base(word):
+                    self.removed_words.add(word)
+            self._changed()
 
-    def get_factor(self, texts):
+    def compact(self):
+        """
+        将增量合并到实例自动机
+        :return:
+        """
+        with _update_lock:
+            self._merge()
+            self._changed()
+
+    def _merge(self):
+        # 已编译的词典为多个实例共享的只读对象，其中被删除的词只能继续记录在删除集合中
+        words = set(self.ac.keys()) if self.ac is not None else set()
+        words.difference_update(self.removed_words)
+        words.update(self.added_words)
+        self.ac = build_automaton(words)
+        self.added_words = set()
+        self.removed_words = {word for word in self.removed_words if any(word in ac for _, _, ac in self.layers)}
+
+    def make_automaton(self):
+        """
+        词典变化后构建匹配用的快照，其中只有增量自动机需要重新构建，多线程并发调用时只构建一次
+        :return: (自动机列表, 删除词集合)
+        """
+        matchers = self._matchers
+        if matchers is None:
+            with _update_lock:
+                if self._matchers is None:
+                    automata = [ac for _, _, ac in self.layers]
+                    if self.ac is not None:
+                        automata.append(self.ac)
+                    if self.added_words:
+                        automata.append(build_automaton(self.added_words))
+                    self._matchers = (automata, frozenset(self.removed_words))
+                matchers = self._matchers
+        return matchers
+
+    def _iter_matches(self, text):
+        """
+        依次在各自动机中匹配，并过滤已删除的词，结果与全部词重新构建一个自动机的匹配结果一致
+        :param text: 目标句子
+        :return: 迭代器，每次返回(结束位置, 长度)
+        """
+        automata, removed_words = self.make_automaton()
+        matches = itertools.chain.from_iterable(ac.iter(text) for ac in automata)
+        if removed_words:
+            matches = (m for m in matches if text[m[0] - m[1] + 1:m[0] + 1] not in removed_words)
+        return matches
+
+    def get_spans(self, text):
+        """
+        获取用户词典在句子中匹配到的词的位置
+        :param text: 目标句子
+        :return: 匹配区间列表[(start, end)]，不包含end
+        """
+        return [(end_pos - length + 1, end_pos + 1) for end_pos, length in self._iter_matches(text)]
+
+    def get_factor(self, texts, dtype=np.float64):
         """
         根据用户词典生成句子对应的干预权重矩阵
         :param texts: 目标句子
+        :param dtype: 干预权重矩阵的数据类型，与模型factor_batch输入保持一致
         :return: 干预权重矩阵
         """
-        if self.ac.kind is not ahocorasick.AHOCORASICK:
-            self.ac.make_automaton()
         max_len = max(map(len, texts))
-        factor_matrix = np.zeros(shape=[len(texts), max_len, Tag.__len__()])  # 干预矩阵中0表示非干预，非零位表示对应位置干预系数
-        for index, text in enumerate(texts):
-            for (end_pos, length) in self.ac.iter(text):
-                start_pos = end_pos - length + 1
-                if length == 1:
-                    factor_matrix[index][start_pos][1] = self.interfere_factor
-                else:
-                    factor_matrix[index][start_pos][2] = self.interfere_factor
-                    factor_matrix[index][end_pos][4] = self.interfere_factor
-                    for i in range(start_pos + 1, end_pos):
-                        factor_matrix[index][i][3] = self.interfere_factor
+        factor_matrix = np.zeros(shape=[len(texts), max_len, Tag.__len__()], dtype=dtype)  # 干预矩阵中0表示非干预，非零位表示对应位置干预系数
+        # 将所有匹配结果展开为(句子下标, 结束位置, 长度)数组，按标签批量赋值
+        matches = [np.fromiter(itertools.chain.from_iterable(self._iter_matches(text)), dtype=np.int64)
+                   for text in texts]
+        rows = np.repeat(np.arange(len(texts)), [m.size // 2 for m in matches])
+        if not rows.size:
+            return factor_matrix
+        end_pos, length = np.concatenate(matches).reshape(-1, 2).T
+        start_pos = end_pos - length + 1
+        single = length == 1
+        factor_matrix[rows[single], start_pos[single], Tag.S.value] = self.interfere_factor
+        multi = ~single
+        factor_matrix[rows[multi], start_pos[multi], Tag.B.value] = self.interfere_factor
+        factor_matrix[rows[multi], end_pos[multi], Tag.E.value] = self.interfere_factor
+        # 每个匹配词的中间字符展开为(句子下标, 位置)对
+        middle_num = np.maximum(length - 2, 0)
+        middle_total = middle_num.sum()
+        if middle_total:
+            match_idx = np.repeat(np.arange(length.size), middle_num)
+            offset = np.arange(middle_total) - np.repeat(np.cumsum(middle_num) - middle_num, middle_num)
+            factor_matrix[rows[match_idx], start_pos[match_idx] + 1 + offset, Tag.M.value] = self.interfere_factor
         return factor_matrix
 
+    def memory_usage(self):
+        """
+        估算实例自己持有的自动机占用的内存，不包含进程内共享的已编译词典
+        :return: 字节数
+        """
+        automata, _ = self.make_automaton()
+        shared = set(id(ac) for _, _, ac in self.layers)
+        return sum(ac.get_stats()['total_size'] for ac in automata if id(ac) not in shared)
+
     def set_interfere_factor(self, interfere_factor):
         """
         设置干预权重
@@ -78,6 +350,7 @@ class Lexicon:
         :return:
         """
         self.interfere_factor = interfere_factor
+        self.version = next(_versions)
 
     def reset_interfere_factor(self):
         """
@@ -85,3 +358,24 @@ class Lexicon:
         :return:
         """
         self.interfere_factor = DEFAULT_INTERFERE_FACTOR
+        self.version = next(_versions)
+
+
+def mixed_factor(texts, lexicons, dtype=np.float64):
+    """
+    每个句子使用各自的词典和干预权重生成干预权重矩阵，使用不同词典的句子可以在同一个batch中预测
+    :param texts: 目标句子
+    :param lexicons: 与句子一一对应的词典列表
+    :param dtype: 干预权重矩阵的数据类型
+    :return: 干预权重矩阵
+    """
+    groups = {}
+    for idx, lexicon in enumerate(lexicons):
+        groups.setdefault(id(lexicon), (lexicon, []))[1].append(idx)
+    if len(groups) == 1:
+        return lexicons[0].get_factor(texts, dtype=dtype)
+    factor_matrix = np.zeros(shape=[len(texts), max(map(len, texts)), Tag.__len__()], dtype=dtype)
+    for lexicon, indices in groups.values():
+        factor = lexicon.get_factor([texts[idx] for idx in indices], dtype=dtype)
+        factor_matrix[indices, :factor.shape[1]] = factor
+    return factor_matrix
@@ -0,0 +1,235 @@
+# Copyright 2020 The MiNLP Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import bisect
+import logging
+import socket
+import threading
+import time
+
+# 各类指标的直方图分桶上界，数值超过最后一个上界时计入+Inf桶
+TIME_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+RATIO_BUCKETS = (0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0)
+
+
+def default_buckets(name):
+    """
+    按指标名称选择分桶：_seconds结尾为耗时，_ratio结尾为比例，其余为数量
+    :param name: 指标名称
+    :return: 分桶上界
+    """
+    if name.endswith('_seconds'):
+        return TIME_BUCKETS
+    if name.endswith('_ratio'):
+        return RATIO_BUCKETS
+    return SIZE_BUCKETS
+
+
+class Histogram:
+    def __init__(self, buckets):
+        """
+        累计直方图
+        :param buckets: 递增的分桶上界
+        """
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def snapshot(self):
+        """
+        :return: 各分桶的累计数量[(上界, 数量)]、总和与总数
+        """
+        cumulative = 0
+        buckets = []
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            cumulative += count
+            buckets.append((bound, cumulative))
+        return {'buckets': buckets, 'sum': self.sum, 'count': self.count}
+
+
+class _Timer:
+    __slots__ = ('metrics', 'name', 'start')
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.metrics.observe(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return False
+
+
+NULL_TIMER = _NullTimer()
+
+
+def null_timer(name):
+    """
+    未开启指标统计时使用的计时器，不做任何事情
+    """
+    return NULL_TIMER
+
+
+class Metrics:
+    def __init__(self, hooks=()):
+        """
+        分词性能指标：各阶段耗时、batch大小和padding比例等直方图，每次记录时依次调用hooks
+        :param hooks: 回调函数列表，参数为(指标名称, 数值)，可用于对接日志、statsd等
+        """
+        self.hooks = list(hooks)
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # 传递到worker进程时只保留hooks，worker中的指标由hooks上报
+        return {'hooks': self.hooks}
+
+    def __setstate__(self, state):
+        self.__init__(state['hooks'])
+
+    def add_hook(self, hook):
+        """
+        添加回调函数
+        :param hook: 回调函数，参数为(指标名称, 数值)
+        """
+        self.hooks.append(hook)
+
+    def observe(self, name, value):
+        """
+        记录一次观测值
+        :param name: 指标名称
+        :param value: 观测值
+        """
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = Histogram(default_buckets(name))
+            histogram.observe(value)
+        for hook in self.hooks:
+            hook(name, value)
+
+    def timer(self, name):
+        """
+        计时器，with语句块的耗时记录为指标name
+        :param name: 指标名称，以_seconds结尾
+        :return: 上下文管理器
+        """
+        return _Timer(self, name)
+
+    def snapshot(self):
+        """
+        :return: {指标名称: 直方图统计}
+        """
+        with self._lock:
+            return {name: histogram.snapshot() for name, histogram in self._histograms.items()}
+
+    def reset(self):
+        """
+        清空已记录的指标
+        """
+        with self._lock:
+            self._histograms.clear()
+
+
+def _escape(name):
+    return ''.join(c if c.isalnum() else '_' for c in name)
+
+
+def prometheus_text(histograms, gauges=None, namespace='minlp'):
+    """
+    生成Prometheus文本格式的指标
+    :param histograms: Metrics.snapshot()的返回值
+    :param gauges: 其他数值型指标{名称: 数值}，如缓存和进程池统计
+    :param namespace: 指标名称前缀
+    :return: Prometheus文本格式字符串
+    """
+    lines = []
+    for name in sorted(histograms):
+        metric = '%s_%s' % (namespace, _escape(name))
+        histogram = histograms[name]
+        lines.append('# TYPE %s histogram' % metric)
+        for bound, count in histogram['buckets']:
+            lines.append('%s_bucket{le="%s"} %d' % (metric, '+Inf' if bound == float('inf') else repr(bound), count))
+        lines.append('%s_sum %r' % (metric, float(histogram['sum'])))
+        lines.append('%s_count %d' % (metric, histogram['count']))
+    for name in sorted(gauges or {}):
+        metric = '%s_%s' % (namespace, _escape(name))
+        lines.append('# TYPE %s gauge' % metric)
+        lines.append('%s %r' % (metric, float(gauges[name])))
+    return '\n'.join(lines) + '\n'
+
+
+class LoggingHook:
+    def __init__(self, logger='minlptokenizer.metrics', level=logging.DEBUG):
+        """
+        将每次观测值写入日志
+        :param logger: 日志名称
+        :param level: 日志级别
+        """
+        self.logger = logger
+        self.level = level
+
+    def __call__(self, name, value):
+        logging.getLogger(self.logger).log(self.level, '%s=%.6f', name, value)
+
+
+class StatsdHook:
+    def __init__(self, host='localhost', port=8125, prefix='minlp'):
+        """
+        通过UDP将观测值发送到statsd，耗时以毫秒timer上报，其余以histogram上报
+        :param host: statsd地址
+        :param port: statsd端口
+        :param prefix: 指标名称前缀
+        """
+        self.address = (host, port)
+        self.prefix = prefix
+        self._socket = None
+
+    def __getstate__(self):
+        # socket无法序列化，worker进程中重新创建
+        state = self.__dict__.copy()
+        state['_socket'] = None
+        return state
+
+    def __call__(self, name, value):
+        if self._socket is None:
+            self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        if name.endswith('_seconds'):
+            payload = '%s.%s:%.3f|ms' % (self.prefix, name[:-len('_seconds')], value * 1000)
+        else:
+            payload = '%s.%s:%s|h' % (self.prefix, name, value)
+        try:
+            self._socket.sendto(payload.encode('UTF-8'), self.address)
+        except OSError:
+            pass  # 指标上报失败不影响分词
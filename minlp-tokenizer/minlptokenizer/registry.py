@@ -0,0 +1,148 @@
+# Copyright 2020 The MiNLP Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import collections
+import os
+import threading
+from minlptokenizer.config import configs
+from minlptokenizer.exception import UnSupportedException
+from minlptokenizer.lexicon import Lexicon, DEFAULT_INTERFERE_FACTOR, read_words
+
+pwd = os.path.dirname(__file__)
+
+
+class LexiconRegistry:
+    def __init__(self, max_memory=configs['lexicon_registry_max_memory'], lexicon_files=None):
+        """
+        多租户用户词典注册表：按词典ID注册词典文件或词列表，首次使用时才加载，
+        已加载词典的自动机内存之和超过max_memory时淘汰最近最少使用的词典，淘汰后再次使用时重新加载，
+        因此运行时对已加载词典的修改在淘汰后不会保留，修改词典请重新注册
+        :param max_memory: 已加载词典的内存上限（字节），内置词典为进程内共享的已编译词典，不计入，为None时不限制
+        :param lexicon_files: 每个词典都包含的内置词典文件，默认为config中的lexicon_files
+        """
+        self.max_memory = max_memory
+        if lexicon_files is None:
+            lexicon_files = [os.path.join(pwd, lexicon_file) for lexicon_file in configs['lexicon_files']]
+        self.lexicon_files = list(lexicon_files)
+        self._sources = {}  # 词典ID -> (词典文件或词列表, 干预权重)
+        self._loaded = collections.OrderedDict()  # 词典ID -> (词典, 内存估算)，按最近使用排序
+        self._memory = 0
+        self._loads = 0
+        self._evictions = 0
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # 已加载的词典不随对象序列化，在其他进程中按需重新加载
+        state = self.__dict__.copy()
+        state.update(_loaded=collections.OrderedDict(), _memory=0, _lock=None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def __contains__(self, lexicon_id):
+        return lexicon_id in self._sources
+
+    def __len__(self):
+        return len(self._sources)
+
+    def register(self, lexicon_id, file_or_list, interfere_factor=DEFAULT_INTERFERE_FACTOR):
+        """
+        注册词典，已注册的词典ID会被替换，下次使用时加载新词典
+        :param lexicon_id: 词典ID
+        :param file_or_list: 用户词典文件路径或者词列表
+        :param interfere_factor: 干预强度
+        """
+        if not isinstance(file_or_list, str):
+            file_or_list = list(file_or_list)
+        with self._lock:
+            self._sources[lexicon_id] = (file_or_list, interfere_factor)
+            self._unload(lexicon_id)
+
+    def register_dir(self, dir_path, suffix='.txt'):
+        """
+        将目录下的每个词典文件注册为一个词典，文件名去掉后缀后作为词典ID
+        :param dir_path: 词典目录
+        :param suffix: 词典文件后缀
+        :return: 注册的词典ID列表
+        """
+        lexicon_ids = []
+        for file_name in sorted(os.listdir(dir_path)):
+            if file_name.endswith(suffix):
+                lexicon_ids.append(file_name[:len(file_name) - len(suffix)])
+                self.register(lexicon_ids[-1], os.path.join(dir_path, file_name))
+        return lexicon_ids
+
+    def unregister(self, lexicon_id):
+        """
+        删除词典
+        :param lexicon_id: 词典ID
+        """
+        with self._lock:
+            self._sources.pop(lexicon_id, None)
+            self._unload(lexicon_id)
+
+    def get(self, lexicon_id):
+        """
+        获取词典，未加载时加载，词典ID未注册时抛出UnSupportedException
+        :param lexicon_id: 词典ID
+        :return: 词典
+        """
+        with self._lock:
+            if lexicon_id in self._loaded:
+                self._loaded.move_to_end(lexicon_id)
+                return self._loaded[lexicon_id][0]
+            if lexicon_id not in self._sources:
+                raise UnSupportedException()
+            source = self._sources[lexicon_id]
+        lexicon = self._load(*source)  # 加载期间不阻塞其他词典的查询
+        with self._lock:
+            if self._sources.get(lexicon_id) is not source:  # 加载期间词典被替换或删除
+                return lexicon
+            if lexicon_id in self._loaded:  # 其他线程已加载
+                self._loaded.move_to_end(lexicon_id)
+                return self._loaded[lexicon_id][0]
+            memory = lexicon.memory_usage()
+            self._loaded[lexicon_id] = (lexicon, memory)
+            self._memory += memory
+            self._loads += 1
+            while self.max_memory is not None and self._memory > self.max_memory and len(self._loaded) > 1:
+                self._unload(next(iter(self._loaded)))
+                self._evictions += 1
+        return lexicon
+
+    def _load(self, file_or_list, interfere_factor):
+        """
+        构建词典：用户词合并为词典自己的自动机，淘汰后即可释放，内置词典使用进程内共享的已编译词典
+        """
+        words = read_words(file_or_list) if isinstance(file_or_list, str) else file_or_list
+        lexicon = Lexicon(words)
+        lexicon.compact()
+        lexicon.add_files(self.lexicon_files)
+        lexicon.set_interfere_factor(interfere_factor)
+        lexicon.make_automaton()
+        return lexicon
+
+    def _unload(self, lexicon_id):
+        if lexicon_id in self._loaded:
+            self._memory -= self._loaded.pop(lexicon_id)[1]
+
+    def info(self):
+        """
+        :return: 注册词典数、已加载词典数、已加载词典的内存估算、内存上限、加载次数和淘汰次数
+        """
+        with self._lock:
+            return {'registered': len(self._sources), 'loaded': len(self._loaded), 'memory': self._memory,
+                    'max_memory': self.max_memory, 'loads': self._loads, 'evictions': self._evictions}
@@ -0,0 +1,427 @@
+# Copyright 2020 The MiNLP Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import json
+import queue
+import asyncio
+import argparse
+import collections
+from http import HTTPStatus
+from urllib.parse import parse_qsl
+from minlptokenizer.config import configs
+from minlptokenizer.engine import BatchingEngine
+from minlptokenizer.exception import ZeroLengthException, MaxLengthException, UnSupportedException
+from minlptokenizer.registry import LexiconRegistry
+from minlptokenizer.tokenizer import MiNLPTokenizer
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message=None):
+        super(Exception, self).__init__()
+        self.status = status
+        self.message = message or HTTPStatus(status).phrase
+
+    def __str__(self):
+        return self.message
+
+
+def dump_json(obj):
+    """
+    序列化响应，包含单独的代理字符等无法以UTF-8编码的字符时转义为ASCII
+    """
+    try:
+        return json.dumps(obj, ensure_ascii=False).encode('UTF-8')
+    except UnicodeEncodeError:
+        return json.dumps(obj).encode('ascii')
+
+
+class BodyReader:
+    def __init__(self, reader, headers, max_size):
+        """
+        读取请求体，支持Content-Length和chunked两种方式
+        :param reader: asyncio.StreamReader
+        :param headers: 请求头，键为小写
+        :param max_size: 请求体最大字节数，流式读取时为单行最大字节数
+        """
+        self.reader = reader
+        self.chunked = headers.get('transfer-encoding', '').lower() == 'chunked'
+        self.remaining = int(headers.get('content-length', 0))
+        if self.remaining < 0:
+            raise ValueError('invalid content-length')
+        self.max_size = max_size
+        self.buffer = b''
+        self.finished = not self.chunked and self.remaining == 0
+        self.broken = False  # 请求体格式错误，无法确定下一个请求的位置
+
+    async def read_chunk(self):
+        """
+        :return: 下一段数据，读完时返回b''
+        """
+        if self.finished:
+            return b''
+        if not self.chunked:
+            data = await self.reader.read(min(self.remaining, 1 << 16))
+            if not data:
+                self.broken = True
+                raise HTTPError(400, 'incomplete body')
+            self.remaining -= len(data)
+            self.finished = self.remaining == 0
+            return data
+        try:
+            size = int((await self.reader.readline()).split(b';')[0].strip() or b'0', 16)
+        except ValueError:
+            self.broken = True
+            raise HTTPError(400, 'invalid chunk size')
+        if size == 0:
+            while (await self.reader.readline()) not in (b'\r\n', b'\n', b''):  # 跳过trailer
+                pass
+            self.finished = True
+            return b''
+        data = await self.reader.readexactly(size)
+        await self.reader.readline()
+        return data
+
+    async def read(self):
+        """
+        :return: 完整请求体
+        """
+        chunks = []
+        size = 0
+        while True:
+            data = await self.read_chunk()
+            if not data:
+                return b''.join(chunks)
+            size += len(data)
+            if size > self.max_size:
+                raise HTTPError(413)
+            chunks.append(data)
+
+    async def readline(self):
+        """
+        :return: 下一行（不含换行符），读完时返回None
+        """
+        while b'\n' not in self.buffer:
+            data = await self.read_chunk()
+            if not data:
+                line, self.buffer = self.buffer, b''
+                return line if line else None
+            self.buffer += data
+            if len(self.buffer) > self.max_size:
+                raise HTTPError(413)
+        line, self.buffer = self.buffer.split(b'\n', 1)
+        return line.rstrip(b'\r')
+
+    async def drain(self):
+        """
+        丢弃未读取的请求体，保证连接可以继续处理下一个请求
+        """
+        while await self.read_chunk():
+            pass
+
+
+class TokenizerServer:
+    def __init__(self, granularities=('fine', 'coarse'), lexicons=None, backend='tf',
+                 max_batch_size=configs['tokenizer_limit']['max_batch_size'],
+                 max_batch_delay=configs['tokenizer_limit']['max_batch_delay'],
+                 max_queue_size=configs['server']['max_queue_size'], lexicon_registry=None):
+        """
+        分词服务：每种粒度对应一个分词引擎，并发请求在引擎中合并为batch，
+        请求通过lexicon选择词典注册表中的用户词典，使用不同词典的请求合并在同一个batch中预测
+        :param granularities: 加载的分词粒度
+        :param lexicons: 用户词典{名称: 词典文件或词列表}，注册到词典注册表中
+        :param backend: 推理后端
+        :param max_batch_size: 合并后batch的最大句子数
+        :param max_batch_delay: 第一个请求到达后最多等待的时间（秒）
+        :param max_queue_size: 每个引擎排队的句子数上限，超过时返回503，单个请求的句子数超过该值时返回413
+        :param lexicon_registry: 词典注册表，默认为None，新建一个注册表
+        """
+        self.granularities = tuple(granularities)
+        self.lexicon_registry = lexicon_registry if lexicon_registry is not None else LexiconRegistry()
+        for name, file_or_list in sorted((lexicons or {}).items()):
+            self.lexicon_registry.register(name, file_or_list)
+        self.max_batch_delay = max_batch_delay
+        self.max_queue_size = max_queue_size
+        self.engines = {}
+        for granularity in self.granularities:
+            tokenizer = MiNLPTokenizer(granularity=granularity, backend=backend,
+                                       lexicon_registry=self.lexicon_registry)
+            self.engines[granularity] = BatchingEngine(tokenizer, max_batch_size, max_batch_delay, max_queue_size)
+
+    def warmup(self):
+        """
+        加载所有模型和默认词典，注册表中的词典在首次请求时加载
+        """
+        for engine in self.engines.values():
+            engine.tokenizer.warmup()
+
+    def close(self):
+        for engine in self.engines.values():
+            engine.close()
+
+    def get_engine(self, request):
+        """
+        按请求中的granularity选择分词引擎，并检查lexicon是否已注册
+        :param request: 请求参数
+        :return: 分词引擎, 词典ID
+        """
+        granularity, lexicon_id = request.get('granularity', self.granularities[0]), request.get('lexicon')
+        if granularity not in self.engines or (lexicon_id is not None and (not isinstance(lexicon_id, str) or
+                                                                           lexicon_id not in self.lexicon_registry)):
+            raise HTTPError(400, 'unsupported granularity or lexicon: %s, %s' % (granularity, lexicon_id))
+        return self.engines[granularity], lexicon_id
+
+    def submit(self, engine, text, lexicon_id=None):
+        """
+        非阻塞提交文本，排队已满时返回None
+        """
+        try:
+            return asyncio.wrap_future(engine.submit(text, block=False, lexicon_id=lexicon_id))
+        except queue.Full:
+            return None
+        except (ZeroLengthException, MaxLengthException, UnSupportedException) as e:
+            raise HTTPError(400, str(e))
+
+    async def cut(self, body):
+        """
+        批量接口：{"text": "..."}或{"texts": [...]}，可选granularity和lexicon
+        """
+        try:
+            request = json.loads(body.decode('UTF-8'))
+        except ValueError:
+            raise HTTPError(400, 'invalid json')
+        if not isinstance(request, dict) or not isinstance(request.get('texts', request.get('text')), (str, list)):
+            raise HTTPError(400, 'text or texts is required')
+        engine, lexicon_id = self.get_engine(request)
+        single = 'texts' not in request
+        texts = [request['text']] if single else request['texts']
+        if not all(isinstance(text, str) for text in texts):
+            raise HTTPError(400, 'text must be a string')
+        if 0 < self.max_queue_size < len(texts):  # 无论何时重试都无法全部排队
+            raise HTTPError(413, 'too many texts: %d > %d' % (len(texts), self.max_queue_size))
+        futures = []
+        try:
+            for text in texts:
+                future = self.submit(engine, text, lexicon_id)
+                if future is None:
+                    raise HTTPError(503)
+                futures.append(future)
+        except Exception:
+            for submitted in futures:  # 取消本请求已提交的部分
+                submitted.cancel()
+            raise
+        results = await asyncio.gather(*futures)
+        return {'result': results[0] if single else list(results)}
+
+    async def cut_stream(self, body, params, writer):
+        """
+        流式接口：请求体每行一条文本，响应以chunked方式按顺序每行返回一条分词结果的json，
+        排队已满或未返回结果过多时暂停读取请求，由TCP流量控制向客户端施加背压
+        :return: 请求体是否已完整读取，未读完时不能复用连接
+        """
+        engine, lexicon_id = self.get_engine(params)
+        writer.write(b'HTTP/1.1 200 OK\r\nContent-Type: application/x-ndjson\r\nTransfer-Encoding: chunked\r\n\r\n')
+        pending = collections.deque()
+
+        async def flush_one():
+            try:
+                result = {'result': await pending.popleft()}
+            except (ZeroLengthException, MaxLengthException, HTTPError) as e:
+                result = {'error': str(e)}
+            except Exception:  # 引擎中的意外错误只影响当前行，不中断整个响应
+                result = {'error': HTTPStatus(500).phrase}
+            data = dump_json(result) + b'\n'
+            writer.write(b'%x\r\n%s\r\n' % (len(data), data))
+            await writer.drain()
+
+        def failed(e):
+            future = asyncio.get_event_loop().create_future()
+            future.set_exception(e)
+            return future
+
+        completed = True
+        while True:
+            try:
+                line = await body.readline()
+            except HTTPError as e:  # 单行过长，返回错误后结束
+                pending.append(failed(e))
+                completed = False
+                break
+            if line is None:
+                break
+            try:
+                text = line.decode('UTF-8')
+            except UnicodeDecodeError:
+                pending.append(failed(HTTPError(400, 'invalid utf-8')))
+                continue
+            while True:
+                try:
+                    future = self.submit(engine, text, lexicon_id)
+                except Exception as e:
+                    future = failed(e)
+                if future is not None:
+                    break
+                if pending:
+                    await flush_one()
+                else:
+                    await asyncio.sleep(self.max_batch_delay)
+            pending.append(future)
+            while len(pending) >= configs['server']['max_stream_pending'] or (pending and pending[0].done()):
+                await flush_one()
+        while pending:
+            await flush_one()
+        writer.write(b'0\r\n\r\n')
+        await writer.drain()
+        return completed
+
+    def health(self):
+        return {'status': 'ok', 'engines': [{'granularity': granularity, 'queue_size': engine.queue_size()}
+                                            for granularity, engine in sorted(self.engines.items())],
+                'lexicons': self.lexicon_registry.info()}
+
+    async def handle(self, reader, writer):
+        """
+        处理一个连接上的HTTP/1.1请求，支持keep-alive
+        """
+        try:
+            while True:
+                try:
+                    request_line = await reader.readline()
+                    if not request_line.strip():
+                        break
+                    method, target, version = request_line.decode('latin-1').split(None, 2)
+                    headers = await self.read_headers(reader)
+                    body = BodyReader(reader, headers, configs['server']['max_body_size'])
+                except ValueError:
+                    # 请求行、请求头过长或格式错误，无法确定请求边界，返回400后关闭连接
+                    await self.write_response(writer, 400, {'error': 'malformed request'}, False)
+                    break
+                keep_alive = headers.get('connection', '').lower() != 'close' and version.strip() == 'HTTP/1.1'
+                path, _, query = target.partition('?')
+                params = dict(parse_qsl(query))
+                try:
+                    if method == 'POST' and path == '/cut/stream':
+                        if not await self.cut_stream(body, params, writer) or not keep_alive:
+                            break
+                        continue
+                    if method == 'POST' and path == '/cut':
+                        status, response = 200, await self.cut(await body.read())
+                    elif method == 'GET' and path == '/health':
+                        status, response = 200, self.health()
+                    else:
+                        raise HTTPError(404)
+                except HTTPError as e:
+                    status, response = e.status, {'error': str(e)}
+                    if body.broken or (status == 413 and not body.finished):
+                        keep_alive = False  # 请求体未读完或格式错误，无法继续复用连接
+                    else:
+                        await body.drain()
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    raise
+                except Exception:
+                    if path == '/cut/stream':  # 已开始返回流式响应，只能关闭连接
+                        raise
+                    status, response = 500, {'error': HTTPStatus(500).phrase}
+                    await body.drain()
+                await self.write_response(writer, status, response, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def read_headers(reader):
+        """
+        读取请求头，请求头行超过StreamReader的长度限制时抛出ValueError
+        :return: 请求头，键为小写
+        """
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                return headers
+            key, _, value = line.decode('latin-1').partition(':')
+            headers[key.strip().lower()] = value.strip()
+
+    @staticmethod
+    async def write_response(writer, status, response, keep_alive):
+        """
+        返回json响应，排队已满时提示客户端稍后重试
+        """
+        data = dump_json(response)
+        headers = 'Retry-After: 1\r\n' if status == 503 else ''
+        writer.write(('HTTP/1.1 %d %s\r\nContent-Type: application/json\r\nContent-Length: %d\r\n%s%s\r\n' % (
+            status, HTTPStatus(status).phrase, len(data), headers,
+            '' if keep_alive else 'Connection: close\r\n')).encode('latin-1') + data)
+        await writer.drain()
+
+    def start(self, host=configs['server']['host'], port=configs['server']['port']):
+        """
+        在当前事件循环中开始监听
+        :return: asyncio.Server的协程
+        """
+        return asyncio.start_server(self.handle, host, port)
+
+    def serve(self, host=configs['server']['host'], port=configs['server']['port']):
+        """
+        启动服务，阻塞直到进程被中断
+        """
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        server = loop.run_until_complete(self.start(host, port))
+        try:
+            loop.run_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.close()
+            loop.run_until_complete(server.wait_closed())
+            loop.close()
+            self.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m minlptokenizer.server', description='MiNLP-Tokenizer分词服务')
+    parser.add_argument('--host', default=configs['server']['host'], help='监听地址')
+    parser.add_argument('--port', type=int, default=configs['server']['port'], help='监听端口')
+    parser.add_argument('--granularity', nargs='+', default=['fine', 'coarse'], choices=('fine', 'coarse'),
+                        help='加载的分词粒度，第一个为默认粒度')
+    parser.add_argument('--lexicon', action='append', default=[], metavar='NAME=PATH',
+                        help='用户词典，请求中通过lexicon=NAME选择，可指定多次')
+    parser.add_argument('--lexicon-dir', help='用户词典目录，每个.txt文件注册为一个词典，文件名为词典名，首次请求时加载')
+    parser.add_argument('--max-lexicon-memory', type=int, default=configs['lexicon_registry_max_memory'] >> 20,
+                        help='已加载用户词典的内存上限（MB），超过时淘汰最近最少使用的词典')
+    parser.add_argument('--backend', default='tf', help='推理后端')
+    parser.add_argument('--max-batch-size', type=int, default=configs['tokenizer_limit']['max_batch_size'],
+                        help='合并后batch的最大句子数')
+    parser.add_argument('--max-batch-delay', type=float, default=configs['tokenizer_limit']['max_batch_delay'] * 1000,
+                        help='合并请求的最大等待时间（毫秒）')
+    parser.add_argument('--max-queue-size', type=int, default=configs['server']['max_queue_size'],
+                        help='每个分词引擎排队的句子数上限，超过时返回503')
+    args = parser.parse_args(argv)
+    lexicons = dict(item.split('=', 1) for item in args.lexicon)
+    registry = LexiconRegistry(args.max_lexicon_memory << 20)
+    if args.lexicon_dir:
+        registry.register_dir(args.lexicon_dir)
+    server = TokenizerServer(args.granularity, lexicons, args.backend, args.max_batch_size,
+                             args.max_batch_delay / 1000, args.max_queue_size, registry)
+    server.warmup()
+    print('MiNLP-Tokenizer server listening on http://%s:%d' % (args.host, args.port))
+    server.serve(args.host, args.port)
+
+
+if __name__ == '__main__':
+    main()
@@ -14,23 +14,43 @@
 
 import regex
 import os
-import tensorflow as tf
 import math
-from minlptokenizer.lexicon import Lexicon
+from minlptokenizer.lexicon import Lexicon, mixed_factor
 from minlptokenizer.vocab import Vocab
 from minlptokenizer.tag import Tag
+from minlptokenizer.cache import LRUCache
+from minlptokenizer.crf import viterbi_decode
+from minlptokenizer.metrics import null_timer
+from minlptokenizer.transport import WordBatch, SpanBatch, prepare_pool
+from minlptokenizer.backend import BACKENDS, InferenceBackend, get_backend, load_stats as backend_load_stats
+from minlptokenizer.autotune import load_profile
 from minlptokenizer.exception import *
 from multiprocessing import Pool
 import itertools
+import functools
+import collections
+import threading
+import bisect
+import time
+from concurrent.futures import ThreadPoolExecutor
+import io
+import numpy as np
+from collections.abc import Iterable
 
-os.environ['TF_CPP_MIN_LOG_LEVEL'] = '2'
 pwd = os.path.dirname(__file__)
 
 
+def is_blank(text):
+    """
+    是否为空白字符串，非字符串交由分词函数报错
+    """
+    return isinstance(text, str) and not text.strip()
+
+
 def batch_generator(list_texts, size=configs['tokenizer_limit']['max_batch_size']):
     """
     list generator 用于迭代生成batch
-    :param list_texts:待切分的语料列表
+    :param list_texts:待切分的语料列表或任意可迭代对象
     :param size: 每个batch的大小
     :return: 迭代器
     """
@@ -38,60 +58,640 @@ def batch_generator(list_texts, size=configs['tokenizer_limit']['max_batch_size'
         batch_num = math.ceil(len(list_texts) / size)
         for i in range(batch_num):
             yield list_texts[i * size:(i + 1) * size]
+    else:
+        iterator = iter(list_texts)
+        batch = list(itertools.islice(iterator, size))
+        while batch:
+            yield batch
+            batch = list(itertools.islice(iterator, size))
 
 
-def format_string(ustring):
+def length_bucket_generator(list_texts, max_tokens=configs['tokenizer_limit']['max_batch_tokens'],
+                            size=configs['tokenizer_limit']['max_batch_size']):
+    """
+    按文本长度排序后生成batch，使每个batch补齐后的字符总数不超过max_tokens，减少padding带来的无效计算
+    :param list_texts: 待切分的语料列表
+    :param max_tokens: 每个batch补齐后的最大字符数（batch大小 * batch内最大长度）
+    :param size: 每个batch的最大句子数
+    :return: 迭代器，每次返回(batch内各句子在原列表中的下标, batch)
+    """
+    order = sorted(range(len(list_texts)), key=lambda i: len(list_texts[i]))
+    indices = []
+    for idx in order:
+        # 按长度升序遍历，当前句子即为加入后batch内的最长句子
+        padded_size = (len(indices) + 1) * len(list_texts[idx])
+        if indices and (padded_size > max_tokens or len(indices) >= size):
+            yield indices, [list_texts[i] for i in indices]
+            indices = []
+        indices.append(idx)
+    if indices:
+        yield indices, [list_texts[i] for i in indices]
+
+
+# 全角空格转半角空格，全角数字、英文字母（除空格和英文标点）转半角
+HALF_WIDTH_TABLE = {12288: 32}
+HALF_WIDTH_TABLE.update({code: code - 65248 for code in itertools.chain(range(65296, 65306), range(65313, 65340))})
+SPACE_PATTERN = regex.compile(r'[\p{Z}\s]+')
+
+
+def format_string(ustring, max_length=configs['tokenizer_limit']['max_string_length']):
     """
     全角转半角，多个连续控制符、空格替换成单个空格
+    :param ustring: 待格式化字符串
+    :param max_length: 最大长度限制，为None时不做限制
     """
     if not ustring.strip():
         raise ZeroLengthException()
 
-    if len(ustring) > configs['tokenizer_limit']['max_string_length']:
+    if max_length is not None and len(ustring) > max_length:
         raise MaxLengthException(len(ustring))
 
-    half_wide_string = ""
-    for uchar in ustring:
-        inside_code = ord(uchar)
-        if inside_code == 12288:  # 全角空格直接转换
-            inside_code = 32
-        elif 65296 <= inside_code <= 65305 or 65313 <= inside_code <= 65339:  # 全角字符（除空格和英文标点）转化
-            inside_code -= 65248
-        half_wide_string += chr(inside_code)
+    return SPACE_PATTERN.sub(' ', ustring.translate(HALF_WIDTH_TABLE).strip())
 
-    return regex.sub(r'[\p{Z}\s]+', ' ', half_wide_string.strip())
+
+def format_string_with_offsets(ustring, max_length=configs['tokenizer_limit']['max_string_length']):
+    """
+    格式化字符串并记录每个字符在原字符串中的位置，格式化结果与format_string一致
+    :param ustring: 待格式化字符串
+    :param max_length: 最大长度限制，为None时不做限制
+    :return: 格式化后的字符串, 每个字符在原字符串中的下标数组
+    """
+    if not ustring.strip():
+        raise ZeroLengthException()
+
+    if max_length is not None and len(ustring) > max_length:
+        raise MaxLengthException(len(ustring))
+
+    translated = ustring.translate(HALF_WIDTH_TABLE)
+    stripped = translated.strip()
+    keep = np.ones(len(stripped), dtype=bool)
+    for match in SPACE_PATTERN.finditer(stripped):
+        keep[match.start() + 1:match.end()] = False  # 连续空白只保留第一个
+    offsets = np.flatnonzero(keep).astype(np.int32) + (len(translated) - len(translated.lstrip()))
+    return SPACE_PATTERN.sub(' ', stripped), offsets
+
+
+def normalize_batch(list_texts):
+    """
+    批量格式化字符串，与逐条调用format_string结果一致
+    :param list_texts: 待格式化的字符串列表
+    :return: 格式化后的字符串列表
+    """
+    return list(map(format_string, list_texts))
+
+
+# regex中\s匹配的空白字符，均不超过U+3000
+WHITESPACE_TABLE = np.array([bool(regex.match(r'\s', chr(code))) for code in range(0x3001)])
+WORD_END_TAGS = np.array([Tag.S.value, Tag.E.value, Tag.X.value])
+
+
+def tag2spans(texts, predict_results):
+    """
+    批量解码标签矩阵，返回每个词在字符串中的区间，空白字符不属于任何词
+    :param texts: 字符串列表
+    :param predict_results: 标签矩阵[batch, max_len]，max_len不小于最长字符串的长度
+    :return: 每个字符串的区间数组列表，数组形状为[词数, 2]，每行为(start, end)，不包含end
+    """
+    tags = np.asarray(predict_results)
+    max_len = tags.shape[1]
+    padded = ''.join(text.ljust(max_len) for text in texts)
+    codes = np.frombuffer(padded.encode('utf-32-le', 'surrogatepass'), dtype=np.uint32).reshape(len(texts), max_len)
+    space = WHITESPACE_TABLE[np.minimum(codes, len(WHITESPACE_TABLE) - 1)] & (codes < len(WHITESPACE_TABLE))
+    word_end = np.isin(tags, WORD_END_TAGS)
+    word_end[:, -1] = True
+    # 非空白字符在前一个字是词尾或空白时为词首，在本身是词尾或后一个字是空白时为词尾
+    starts = ~space
+    starts[:, 1:] &= word_end[:, :-1] | space[:, :-1]
+    ends = ~space & word_end
+    ends[:, :-1] |= ~space[:, :-1] & space[:, 1:]
+    rows, start_cols = np.nonzero(starts)
+    _, end_cols = np.nonzero(ends)
+    spans = np.stack([start_cols, end_cols + 1], axis=1).astype(np.int32)
+    return np.split(spans, np.cumsum(np.bincount(rows, minlength=len(texts)))[:-1])
+
+
+def spans2words(text, spans):
+    """
+    按区间取出词
+    :param text: 字符串
+    :param spans: 区间数组[词数, 2]
+    :return: 词列表
+    """
+    return [text[start:end] for start, end in spans.tolist()]
+
+
+def map_spans(spans, offsets):
+    """
+    将格式化后字符串中的区间映射回原字符串
+    :param spans: 区间数组[词数, 2]
+    :param offsets: format_string_with_offsets返回的下标数组
+    :return: 原字符串中的区间数组
+    """
+    return np.stack([offsets[spans[:, 0]], offsets[spans[:, 1] - 1] + 1], axis=1)
+
+
+def nest_spans(text, coarse_spans, fine_spans):
+    """
+    将细粒度分词结果嵌套到粗粒度词中，跨越粗粒度词边界的细粒度词在边界处截断
+    :param text: 字符串
+    :param coarse_spans: 粗粒度区间数组[词数, 2]
+    :param fine_spans: 细粒度区间数组[词数, 2]
+    :return: [(粗粒度词, 其包含的细粒度词列表)]
+    """
+    firsts = np.searchsorted(fine_spans[:, 1], coarse_spans[:, 0], side='right')
+    lasts = np.searchsorted(fine_spans[:, 0], coarse_spans[:, 1], side='left')
+    nested = []
+    for (start, end), first, last in zip(coarse_spans.tolist(), firsts.tolist(), lasts.tolist()):
+        words = [text[max(s, start):min(e, end)] for s, e in fine_spans[first:last].tolist()]
+        nested.append((text[start:end], words))
+    return nested
 
 
 def tag2words(text, predict_results):
-    words = []
-    word = ''
-    for idx, ch in enumerate(text):
-        word += ch
-        tag = predict_results[idx]
-        if tag == Tag.S.value or tag == Tag.E.value or tag == Tag.X.value:
-            words.append(word)
-            word = ''
-    if word:
-        words.append(word)
-    return regex.split(r'\s+', ' '.join(words))
+    return spans2words(text, tag2spans([text], [predict_results[:max(len(text), 1)]])[0])
+
+
+# 规则分词的词：网址、邮箱、数字、拉丁字母与数字组成的词、标点符号串
+FAST_PATH_TOKEN_PATTERN = regex.compile(r"""
+    (?:https?://|www\.)[!-~]*[A-Za-z0-9/=_#-]
+  | [A-Za-z0-9._%+-]+@[A-Za-z0-9-]+(?:\.[A-Za-z0-9-]+)+
+  | [0-9]+(?:[.,:/][0-9]+)*(?:%|[\p{Latin}\p{M}0-9_]*)
+  | [\p{Latin}\p{M}0-9_]+(?:['’][\p{Latin}\p{M}]+)*
+  | [\p{P}\p{S}]+
+""", regex.VERBOSE)
+PIECE_PATTERN = regex.compile(r'[^ ]+')
+
+
+def fast_path_split(text, protected_spans=()):
+    """
+    预切分：以空格分隔的片段若能完全由规则分词且不与用户词典匹配到的词重叠，则直接按规则分词，
+    其余片段（含汉字等需要模型的字符）按原有顺序合并为连续的模型片段
+    :param text: 格式化后的字符串
+    :param protected_spans: 用户词典匹配到的词的区间列表[(start, end)]
+    :return: 模型片段的区间列表[(start, end)], 规则分词的区间数组[词数, 2]
+    """
+    covered = None
+    if protected_spans:
+        covered = np.zeros(len(text) + 1, dtype=np.int32)
+        for start, end in protected_spans:
+            covered[start] += 1
+            covered[end] -= 1
+        covered = np.cumsum(covered[:-1]) > 0
+    segments = []
+    rule_spans = []
+    for piece in PIECE_PATTERN.finditer(text):
+        start, end = piece.span()
+        tokens = []
+        if covered is None or not covered[start:end].any():
+            for match in FAST_PATH_TOKEN_PATTERN.finditer(text, start, end):
+                if match.start() != (tokens[-1][1] if tokens else start):
+                    break
+                tokens.append(match.span())
+        if tokens and tokens[-1][1] == end:
+            rule_spans.extend(tokens)
+        elif segments and text[segments[-1][1]:start] == ' ':
+            segments[-1] = (segments[-1][0], end)  # 与前一个模型片段相邻
+        else:
+            segments.append((start, end))
+    return segments, np.array(rule_spans, dtype=np.int32).reshape(-1, 2)
+
+
+def merge_spans(layout, segment_spans):
+    """
+    将模型片段的区间平移回原字符串，并与规则分词的区间按位置合并
+    :param layout: 每个字符串的fast_path_split结果列表
+    :param segment_spans: 所有模型片段的区间数组列表，顺序与layout中的模型片段一致
+    :return: 每个字符串的区间数组列表
+    """
+    segment_spans = iter(segment_spans)
+    merged = []
+    for segments, rule_spans in layout:
+        spans = np.concatenate([rule_spans] + [next(segment_spans) + start for start, _ in segments])
+        merged.append(spans[np.argsort(spans[:, 0], kind='stable')])
+    return merged
+
+
+# 分词流水线各阶段之间传递的中间结果：keys和results为缓存键和缓存查询结果，missed_keys为未命中的缓存键，
+# 未开启缓存时均为None，missed为需要模型预测的句子，encoded为其模型输入，
+# layout为开启快速路径时的预切分结果，否则为None，此时缓存和模型预测均以模型片段为单位
+PreparedBatch = collections.namedtuple('PreparedBatch', ['texts', 'spans', 'keys', 'results', 'missed_keys', 'missed',
+                                                         'encoded', 'layout'])
+
+_worker_tokenizer = None
+_worker_error = None
+
+
+def _init_worker(tokenizer):
+    """
+    进程池worker初始化：保存分词器并预加载字表、词典和模型，每个进程只执行一次。
+    初始化中抛出异常会使进程池不断重建worker，因此加载失败时保存异常，在执行任务时抛出
+    :param tokenizer: 分词器
+    """
+    global _worker_tokenizer, _worker_error
+    _worker_tokenizer = tokenizer
+    try:
+        _worker_tokenizer.warmup()
+    except Exception as e:
+        _worker_error = e
+
+
+def _get_worker_tokenizer():
+    if _worker_error is not None:
+        raise _worker_error
+    return _worker_tokenizer
+
+
+# worker以紧凑格式返回分词结果，避免嵌套列表的序列化和反序列化开销
+def _worker_cut(text_batch):
+    return WordBatch(_get_worker_tokenizer()._cut(text_batch))
+
+
+def _worker_tokenize(texts):
+    return WordBatch(_get_worker_tokenizer()._tokenize(texts))
+
+
+def _worker_tokenize_spans(texts):
+    return SpanBatch(_get_worker_tokenizer()._tokenize(texts, spans=True))
+
+
+SENTENCE_BOUNDARY_PATTERN = regex.compile(r'[。！？!?；;…]+[”’"』」）)]*')
+CLAUSE_BOUNDARY_PATTERN = regex.compile(r'[，,、：: ]+')
+
+
+def split_text(text, max_length=configs['tokenizer_limit']['document_chunk_length'], protected_spans=()):
+    """
+    将长文本切分为长度不超过max_length的片段，依次尝试在句末标点、逗号或空格处切分，最后按长度强制切分
+    :param text: 格式化后的文本
+    :param max_length: 片段最大长度
+    :param protected_spans: 强制切分时需要保持完整的区间列表[(start, end)]，如用户词典匹配到的词
+    :return: 片段列表，拼接后与原文本一致
+    """
+    if len(text) <= max_length:
+        return [text]
+    levels = [[m.end() for m in pattern.finditer(text)] for pattern in (SENTENCE_BOUNDARY_PATTERN,
+                                                                        CLAUSE_BOUNDARY_PATTERN)]
+    inside = set(itertools.chain.from_iterable(range(start + 1, end) for start, end in protected_spans))
+    chunks = []
+    start = 0
+    while len(text) - start > max_length:
+        limit = start + max_length
+        cut = None
+        for boundaries in levels:
+            idx = bisect.bisect_right(boundaries, limit) - 1
+            if idx >= 0 and boundaries[idx] > start:
+                cut = boundaries[idx]
+                break
+        if cut is None:
+            cut = next((pos for pos in range(limit, start, -1) if pos not in inside), limit)
+        chunks.append(text[start:cut])
+        start = cut
+    chunks.append(text[start:])
+    return chunks
 
 
 class MiNLPTokenizer:
-    sess_dict = {'fine': None, 'coarse': None}
+    vocab_lock = threading.Lock()
+    lexicon_lock = threading.Lock()
 
-    def __init__(self, file_or_list=None, granularity='fine'):
+    def __init__(self, file_or_list=None, granularity='fine', cache_size=0, cache_ttl=None, preload=False,
+                 backend='tf', intra_op_threads=0, inter_op_threads=0, decoder='graph',
+                 metrics=None, fast_path=False, lexicon_registry=None, batch_size=None, profile=None):
         """
-        分词器初始化
+        分词器初始化，字表、词典和模型均在首次使用时加载
         :param file_or_list: 用户自定义词典文件或列表
         :param granularity: 分词粒度参数，fine表示细粒度分词，coarse表示粗粒度分词
+        :param cache_size: 分词结果缓存的最大条数，默认为0，不开启缓存
+        :param cache_ttl: 分词结果缓存的过期时间（秒），默认为None，不过期
+        :param preload: 是否在后台线程中并行预加载字表、词典和模型
+        :param backend: 推理后端，tf表示TensorFlow Session（默认），onnx表示ONNX Runtime
+        :param intra_op_threads: 推理后端单个算子内部的并行线程数，默认为0，由推理后端决定
+        :param inter_op_threads: 推理后端算子之间的并行线程数，默认为0，由推理后端决定
+        :param decoder: CRF解码方式，graph表示在模型内解码（默认），numpy表示取出发射分数和转移矩阵在Python侧解码，
+                        此时词典干预以加性方式作用于发射分数，开启缓存时词典或干预强度变化后可复用缓存的发射分数
+        :param metrics: minlptokenizer.metrics.Metrics对象，记录各阶段耗时、batch大小和padding比例，默认为None，不统计
+        :param fast_path: 是否开启快速路径，以空格分隔且不含汉字的片段（英文单词、数字、网址、邮箱、标点）按规则分词，
+                          只有其余片段进行模型预测，默认为False
+        :param lexicon_registry: minlptokenizer.registry.LexiconRegistry对象，多租户分词时按词典ID从中获取用户词典，
+                                 可在多个分词器之间共享，默认为None
+        :param batch_size: 每个batch的最大句子数，默认为None，使用调优配置或config中的max_batch_size
+        :param profile: minlptokenizer.autotune生成的调优配置，True表示默认路径，也可传入配置文件路径或配置字典，
+                        应用其中的batch大小、默认进程数和推理后端线程数（多进程时为每个进程的线程数），
+                        构造函数中显式指定的参数优先，默认为None，不使用调优配置
         """
         self.__vocab_path = os.path.join(pwd, configs['vocab_path'])
-        self.__pb_model_path = os.path.join(pwd, configs['tokenizer_granularity'][granularity]['model'])
-        self.__vocab = Vocab(self.__vocab_path)
-        self.__lexicon = Lexicon(file_or_list)
+        if backend not in BACKENDS or decoder not in ('graph', 'numpy'):
+            raise UnSupportedException()
+        if decoder == 'numpy' and BACKENDS[backend][0].emissions is InferenceBackend.emissions:
+            raise UnSupportedException()  # 推理后端不支持输出发射分数
+        tuned = load_profile(profile, backend, granularity) if profile is not None else {}
+        if not intra_op_threads and not inter_op_threads:
+            intra_op_threads = tuned.get('intra_op_threads', 0)
+            inter_op_threads = tuned.get('inter_op_threads', 0)
+        self.__batch_size = batch_size or tuned.get('max_batch_size', configs['tokenizer_limit']['max_batch_size'])
+        self.__n_jobs = tuned.get('n_jobs', 1)
+        self.__backend_key = (backend, granularity, intra_op_threads, inter_op_threads)
+        self.__file_or_list = file_or_list
+        self.__vocab = None
+        self.__lexicon = None
         self.__granularity = granularity
-        for lexicon_file in configs['lexicon_files']:
-            self.__lexicon.add_words(os.path.join(pwd, lexicon_file))
+        self.__pool = None
+        self.__pool_size = 0
+        self.__cache = LRUCache(cache_size, cache_ttl) if cache_size > 0 else None
+        self.__cache_version = None
+        self.__decoder = decoder
+        self.__emission_cache = LRUCache(cache_size, cache_ttl) if cache_size > 0 and decoder == 'numpy' else None
+        self.__fast_path = fast_path
+        self.__lexicon_registry = lexicon_registry
+        self.__metrics = metrics
+        self.__timer = metrics.timer if metrics is not None else null_timer
+        self.__created_time = time.perf_counter()
+        self.__startup_stats = {}
+        if preload:
+            threading.Thread(target=self.warmup, name='minlp-preload', daemon=True).start()
+
+    def __getstate__(self):
+        # 进程池无法序列化，worker中不需要持有进程池
+        state = self.__dict__.copy()
+        state['_MiNLPTokenizer__pool'] = None
+        state['_MiNLPTokenizer__pool_size'] = 0
+        return state
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        """
+        关闭多进程分词使用的进程池
+        """
+        if self.__pool is not None:
+            self.__pool.close()
+            self.__pool.join()
+            self.__pool = None
+            self.__pool_size = 0
+
+    def _get_pool(self, n_jobs):
+        """
+        获取常驻进程池，进程数变化时重新创建，worker在初始化时预加载模型
+        :param n_jobs: 进程数量
+        :return: 进程池
+        """
+        if self.__pool is None or self.__pool_size != n_jobs:
+            self.close()
+            prepare_pool()
+            self.__pool = Pool(n_jobs, initializer=_init_worker, initargs=(self,))
+            self.__pool_size = n_jobs
+        return self.__pool
+
+    def _map_batches(self, func, worker_func, batches, n_jobs, cache_mode=None):
+        """
+        按顺序返回每个batch的分词结果，多进程时限制同时提交的batch数量。
+        多进程且开启缓存时先在主进程查询缓存，只把未命中的文本提交给worker，并将worker的结果写回缓存
+        :param func: 单进程分词函数
+        :param worker_func: 进程池worker中执行的分词函数
+        :param batches: batch迭代器
+        :param n_jobs: 进程数量
+        :param cache_mode: 主进程缓存键中区分结果类型的标记，'cut'、'words'或'spans'
+        :return: 迭代器，每次返回一个batch的分词结果
+        """
+        if n_jobs == 1:
+            for batch in batches:
+                yield func(batch)
+            return
+        pool = self._get_pool(n_jobs)
+        max_pending = n_jobs * configs['tokenizer_limit']['max_pending_batches']
+        pending = collections.deque()
+        for batch in batches:
+            pending.append(self._submit_batch(pool, worker_func, batch, cache_mode))
+            if len(pending) >= max_pending:
+                with self.__timer('pool_wait_seconds'):
+                    result = self._collect_batch(*pending.popleft())
+                yield result
+        while pending:
+            with self.__timer('pool_wait_seconds'):
+                result = self._collect_batch(*pending.popleft())
+            yield result
+
+    def _submit_batch(self, pool, worker_func, batch, cache_mode):
+        """
+        将batch提交给进程池，开启缓存时只提交主进程缓存未命中的文本，同一batch中重复的文本只提交一次
+        :param pool: 进程池
+        :param worker_func: 进程池worker中执行的分词函数
+        :param batch: 字符串列表
+        :param cache_mode: 缓存键中区分结果类型的标记
+        :return: (缓存键列表, 缓存查询结果, 未命中的缓存键列表, 异步结果)，未开启缓存时前三项为None
+        """
+        if self.__cache is None or cache_mode is None:
+            return None, None, None, pool.apply_async(worker_func, (batch,))
+        lexicon = self._get_lexicon()
+        if self.__cache_version != lexicon.version:  # 用户词典或干预权重发生变化
+            self.__cache.clear()
+            self.__cache_version = lexicon.version
+        # 以整条文本为单位缓存，与worker中以模型输入片段为单位的键通过最后一项区分
+        keys = [(text, self.__granularity, lexicon.interfere_factor, cache_mode) for text in batch]
+        results = self.__cache.get_many(keys)
+        missed_keys = list(collections.OrderedDict.fromkeys(key for key, words in zip(keys, results) if words is None))
+        if not missed_keys:
+            return keys, results, missed_keys, None
+        return keys, results, missed_keys, pool.apply_async(worker_func, ([key[0] for key in missed_keys],))
+
+    def _collect_batch(self, keys, results, missed_keys, async_result):
+        """
+        等待worker返回分词结果，开启缓存时写回缓存并与缓存命中的结果合并
+        :return: batch的分词结果
+        """
+        if keys is None:
+            return async_result.get()
+        spans = keys[0][3] == 'spans' if keys else False
+        predicted = {}
+        if missed_keys:
+            for key, words in zip(missed_keys, async_result.get()):
+                if spans:
+                    words.setflags(write=False)  # 缓存中的区间数组为共享只读
+                predicted[key] = words if spans else tuple(words)
+                self.__cache.put(key, predicted[key])
+        merged = [words if words is not None else predicted[key] for key, words in zip(keys, results)]
+        return merged if spans else [list(words) for words in merged]
+
+    def _get_vocab(self):
+        """
+        获取字表，首次调用时加载
+        :return: 字表
+        """
+        if self.__vocab is None:
+            with MiNLPTokenizer.vocab_lock:
+                if self.__vocab is None:
+                    start = time.perf_counter()
+                    self.__vocab = Vocab(self.__vocab_path)
+                    self.__startup_stats['vocab_load'] = time.perf_counter() - start
+        return self.__vocab
+
+    def _get_lexicon(self, lexicon_id=None):
+        """
+        获取用户词典，首次调用时读取用户词典和内置词典并构建自动机
+        :param lexicon_id: 词典ID，默认为None，表示分词器自己的用户词典，否则从词典注册表中获取
+        :return: 用户词典
+        """
+        if lexicon_id is not None:
+            if self.__lexicon_registry is None:
+                raise UnSupportedException()
+            return self.__lexicon_registry.get(lexicon_id)
+        if self.__lexicon is None:
+            with MiNLPTokenizer.lexicon_lock:
+                if self.__lexicon is None:
+                    start = time.perf_counter()
+                    self.__lexicon = self._build_lexicon(self.__file_or_list)
+                    self.__startup_stats['lexicon_load'] = time.perf_counter() - start
+        return self.__lexicon
+
+    def _has_lexicon(self, lexicon_id):
+        """
+        检查词典ID是否已在词典注册表中注册，不加载词典
+        :param lexicon_id: 词典ID
+        :return: 是否已注册
+        """
+        return self.__lexicon_registry is not None and lexicon_id in self.__lexicon_registry
+
+    @staticmethod
+    def _build_lexicon(file_or_list):
+        """
+        构建包含用户词典和内置词典的词典
+        :param file_or_list: 用户自定义词典文件或列表
+        :return: 词典
+        """
+        lexicon = Lexicon(file_or_list)
+        lexicon.add_files([os.path.join(pwd, lexicon_file) for lexicon_file in configs['lexicon_files']])
+        lexicon.make_automaton()
+        return lexicon
+
+    def warmup(self):
+        """
+        并行加载字表、词典和模型，避免首次分词时的加载延迟
+        :return: 启动耗时统计，见startup_stats
+        """
+        with ThreadPoolExecutor(3) as executor:
+            futures = [executor.submit(func) for func in (self._get_vocab, self._get_lexicon, self._load_backend)]
+            for future in futures:
+                future.result()
+        self.__startup_stats.setdefault('cold_start', time.perf_counter() - self.__created_time)
+        return self.startup_stats()
+
+    def startup_stats(self):
+        """
+        启动耗时统计（秒）：tensorflow_import为导入TensorFlow耗时，model_load为加载当前推理后端模型耗时，
+        vocab_load、lexicon_load为加载字表、词典耗时，cold_start为创建分词器到warmup完成的耗时，
+        first_cut为创建分词器到首次分词完成的耗时，尚未发生的阶段不包含在结果中
+        :return: 耗时统计
+        """
+        stats = dict(self.__startup_stats)
+        for key in ('tensorflow_import', 'onnxruntime_import'):
+            if key in backend_load_stats:
+                stats[key] = backend_load_stats[key]
+        if self.__backend_key in backend_load_stats:
+            stats['model_load'] = backend_load_stats[self.__backend_key]
+        return stats
+
+    def _get_n_jobs(self, n_jobs):
+        """
+        检查进程数量
+        :param n_jobs: 进程数量，为None时使用调优配置中的进程数，未使用调优配置时为1
+        :return: 进程数量
+        """
+        n_jobs = self.__n_jobs if n_jobs is None else n_jobs
+        if n_jobs <= 0:
+            raise ThreadNumberException()
+        return n_jobs
+
+    def _run_batches(self, batches, n_jobs, pipeline=False, normalize=True, spans=False):
+        """
+        按顺序返回每个batch的分词结果，根据参数选择多进程、流水线或逐batch执行
+        :param batches: batch迭代器
+        :param n_jobs: 进程数量
+        :param pipeline: 单进程时是否使用流水线
+        :param normalize: batch是否需要format_string处理
+        :param spans: 是否返回词的区间数组
+        :return: 迭代器，每次返回一个batch的分词结果
+        """
+        if n_jobs == 1 and pipeline:
+            return self._pipeline_batches(batches, normalize, spans)
+        if normalize:
+            return self._map_batches(self._cut, _worker_cut, batches, n_jobs, 'cut')
+        func = functools.partial(self._tokenize, spans=True) if spans else self._tokenize
+        worker_func = _worker_tokenize_spans if spans else _worker_tokenize
+        return self._map_batches(func, worker_func, batches, n_jobs, 'spans' if spans else 'words')
+
+    def _pipeline_batches(self, batches, normalize=True, spans=False):
+        """
+        流水线分词：当前batch进行模型预测时，预处理线程准备后续batch，后处理线程解码之前的batch，
+        模型预测期间释放GIL，三个阶段在一个进程内并行，各阶段排队的batch数不超过pipeline_depth
+        :param batches: batch迭代器
+        :param normalize: batch是否需要format_string处理
+        :param spans: 是否返回词的区间数组
+        :return: 迭代器，按顺序返回每个batch的分词结果
+        """
+        def prepare(batch):
+            if normalize:
+                with self.__timer('format_seconds'):
+                    batch = normalize_batch(batch)
+            return self._prepare(batch, spans)
+
+        depth = configs['tokenizer_limit']['pipeline_depth']
+        batches = iter(batches)
+        prepare_executor = ThreadPoolExecutor(1)
+        decode_executor = ThreadPoolExecutor(1)
+        try:
+            prepared = collections.deque(prepare_executor.submit(prepare, batch)
+                                         for batch in itertools.islice(batches, depth))
+            decoded = collections.deque()
+            while prepared:
+                current = prepared.popleft().result()
+                for batch in itertools.islice(batches, 1):
+                    prepared.append(prepare_executor.submit(prepare, batch))
+                decoded.append(decode_executor.submit(self._decode, current, self._infer(current)))
+                while decoded and (len(decoded) > depth or decoded[0].done()):
+                    yield decoded.popleft().result()
+            while decoded:
+                yield decoded.popleft().result()
+        finally:
+            prepare_executor.shutdown()
+            decode_executor.shutdown()
+
+    def _get_backend_key(self, granularity=None):
+        """
+        获取推理后端配置
+        :param granularity: 分词粒度，默认为None，使用分词器的分词粒度
+        :return: (推理后端, 分词粒度, 算子内线程数, 算子间线程数)
+        """
+        if granularity is None:
+            return self.__backend_key
+        return self.__backend_key[:1] + (granularity,) + self.__backend_key[2:]
+
+    def _load_backend(self, granularity=None):
+        """
+        加载推理后端，相同配置的推理后端在进程内共享
+        :param granularity: 分词粒度，默认为None，使用分词器的分词粒度
+        :return: 推理后端
+        """
+        return get_backend(*self._get_backend_key(granularity))
+
+    def _encode(self, texts, backend, lexicons=None):
+        """
+        生成模型输入
+        :param texts: 格式化后的字符串列表
+        :param backend: 推理后端
+        :param lexicons: 与句子一一对应的用户词典列表，默认为None，均使用分词器自己的用户词典
+        :return: char id矩阵, 干预权重矩阵
+        """
+        with self.__timer('encode_seconds'):
+            char_ids = self._get_vocab().get_char_ids(texts, dtype=backend.char_ids_dtype)
+        with self.__timer('lexicon_seconds'):
+            if lexicons is None:
+                factor = self._get_lexicon().get_factor(texts, dtype=backend.factor_dtype)
+            else:
+                factor = mixed_factor(texts, lexicons, dtype=backend.factor_dtype)
+        return char_ids, factor
 
     def _cut(self, text_batch):
         """
@@ -99,64 +699,482 @@ class MiNLPTokenizer:
         :param text_batch: 待分词字符串列表
         :return: 分词结果
         """
-        # pb模型加载
-        if not MiNLPTokenizer.sess_dict[self.__granularity]:
-            with tf.io.gfile.GFile(self.__pb_model_path, 'rb') as f:
-                graph_def = tf.compat.v1.GraphDef()
-                graph_def.ParseFromString(f.read())
-            g = tf.Graph()
-            with g.as_default():
-                tf.import_graph_def(graph_def, name='')
-            tf_config = tf.compat.v1.ConfigProto()
-            tf_config.gpu_options.allow_growth = True  # 使用过程中动态申请显存，按需分配
-            MiNLPTokenizer.sess_dict[self.__granularity] = tf.compat.v1.Session(graph=g, config=tf_config)
-        sess = MiNLPTokenizer.sess_dict[self.__granularity]
-        char_ids_input = sess.graph.get_tensor_by_name('char_ids_batch:0')
-        factor_input = sess.graph.get_tensor_by_name('factor_batch:0')
-        tag_ids = sess.graph.get_tensor_by_name('tag_ids:0')
-        # 模型预测
-        texts = list(map(format_string, text_batch))
-        factor = self.__lexicon.get_factor(texts)
-        input_char_id = self.__vocab.get_char_ids(texts)
-        feed_dict = {
-            char_ids_input: input_char_id,
-            factor_input: factor
-        }
-        predict_results = sess.run(tag_ids, feed_dict=feed_dict)
-        return list(map(lambda x, y: tag2words(x, y), texts, predict_results))
-
-    def cut(self, text_or_list, n_jobs=1):
+        with self.__timer('format_seconds'):
+            texts = normalize_batch(text_batch)
+        return self._tokenize(texts)
+
+    def _tokenize(self, texts, spans=False, lexicon_ids=None):
+        """
+        对已经过format_string处理的字符串列表分词，开启缓存时只有未命中的句子进行模型预测
+        :param texts: 格式化后的字符串列表
+        :param spans: 是否返回词的区间数组，默认返回词列表
+        :param lexicon_ids: 与句子一一对应的词典ID列表，默认为None，均使用分词器自己的用户词典
+        :return: 分词结果
+        """
+        prepared = self._prepare(texts, spans, lexicon_ids=lexicon_ids)
+        return self._decode(prepared, self._infer(prepared))
+
+    def _prepare(self, texts, spans=False, use_cache=True, lexicon_ids=None):
+        """
+        预处理阶段：开启快速路径时先预切分，再查询缓存，为未命中的句子生成模型输入
+        :param texts: 格式化后的字符串列表
+        :param spans: 是否返回词的区间数组
+        :param use_cache: 是否查询分词结果缓存，结果与分词粒度无关时为False
+        :param lexicon_ids: 与句子一一对应的词典ID列表，默认为None，均使用分词器自己的用户词典
+        :return: 预处理结果，依次传给_infer和_decode
+        """
+        lexicon = self._get_lexicon()
+        if lexicon_ids is not None and any(lexicon_id is not None for lexicon_id in lexicon_ids):
+            resolved = dict((lexicon_id, self._get_lexicon(lexicon_id)) for lexicon_id in set(lexicon_ids))
+            lexicons = [resolved[lexicon_id] for lexicon_id in lexicon_ids]
+        else:
+            lexicon_ids = lexicons = None
+        layout = None
+        model_texts = texts
+        if self.__fast_path:
+            row_lexicons = itertools.repeat(lexicon) if lexicons is None else lexicons
+            with self.__timer('fast_path_seconds'):
+                layout = [fast_path_split(text, row_lexicon.get_spans(text))
+                          for text, row_lexicon in zip(texts, row_lexicons)]
+                model_texts = [text[start:end] for text, (segments, _) in zip(texts, layout)
+                               for start, end in segments]
+            if lexicons is not None:  # 模型片段使用所在句子的词典
+                repeats = [len(segments) for segments, _ in layout]
+                lexicon_ids = [lexicon_id for lexicon_id, n in zip(lexicon_ids, repeats) for _ in range(n)]
+                lexicons = [row for row, n in zip(lexicons, repeats) for _ in range(n)]
+            if self.__metrics is not None:
+                self.__metrics.observe('fast_path_ratio', 1 - sum(map(len, model_texts)) / max(sum(map(len, texts)), 1))
+        model_spans = spans or layout is not None
+        if self.__cache is None or not use_cache:
+            encoded = self._encode(model_texts, self._load_backend(), lexicons) if model_texts else None
+            return PreparedBatch(texts, spans, None, None, None, model_texts, encoded, layout)
+        if self.__cache_version != lexicon.version:  # 用户词典或干预权重发生变化
+            self.__cache.clear()
+            self.__cache_version = lexicon.version
+        if lexicons is None:
+            keys = [(text, self.__granularity, lexicon.interfere_factor, model_spans) for text in model_texts]
+        else:
+            # 词典注册表中的词典以词典ID和版本区分缓存，词典变化后旧结果不再命中，由LRU淘汰
+            keys = [(text, self.__granularity, row.interfere_factor, model_spans) +
+                    (() if lexicon_id is None else (lexicon_id, row.version))
+                    for text, lexicon_id, row in zip(model_texts, lexicon_ids, lexicons)]
+        results = self.__cache.get_many(keys)
+        missed_keys = list(collections.OrderedDict.fromkeys(key for key, words in zip(keys, results) if words is None))
+        missed = [key[0] for key in missed_keys]
+        missed_lexicons = None
+        if lexicons is not None:
+            key_lexicons = dict(zip(keys, lexicons))
+            missed_lexicons = [key_lexicons[key] for key in missed_keys]
+        encoded = self._encode(missed, self._load_backend(), missed_lexicons) if missed else None
+        return PreparedBatch(texts, spans, keys, results, missed_keys, missed, encoded, layout)
+
+    def _infer(self, prepared, granularity=None):
+        """
+        模型预测阶段
+        :param prepared: _prepare的返回值
+        :param granularity: 分词粒度，默认为None，使用分词器的分词粒度
+        :return: 未命中缓存的句子的标签矩阵
+        """
+        texts = prepared.missed
+        if not texts:
+            return None
+        backend_key = self._get_backend_key(granularity)
+        backend = get_backend(*backend_key)
+        char_ids, factor = prepared.encoded
+        if self.__metrics is not None:
+            self.__metrics.observe('batch_size', len(texts))
+            self.__metrics.observe('padding_ratio', 1 - sum(map(len, texts)) / max(char_ids.size, 1))
+        if self.__decoder == 'numpy':
+            with self.__timer('inference_seconds'):
+                emissions = self._get_emissions(texts, char_ids, backend, backend_key)
+            with self.__timer('crf_decode_seconds'):
+                lengths = np.fromiter(map(len, texts), dtype=np.int64, count=len(texts))
+                emissions = backend.interfere(char_ids, emissions, factor)
+                return viterbi_decode(emissions, backend.transitions(), lengths)
+        with self.__timer('inference_seconds'):
+            return backend.predict(char_ids, factor)
+
+    def _decode(self, prepared, predict_results):
+        """
+        后处理阶段：解码标签矩阵，写入缓存并与缓存命中的结果合并，开启快速路径时再与规则分词的结果合并
+        :param prepared: _prepare的返回值
+        :param predict_results: _infer的返回值
+        :return: 分词结果
+        """
+        model_spans = prepared.spans or prepared.layout is not None
+        decoded = []
+        if prepared.missed:
+            with self.__timer('postprocess_seconds'):
+                decoded = tag2spans(prepared.missed, predict_results)
+                if not model_spans:
+                    decoded = list(map(spans2words, prepared.missed, decoded))
+            self.__startup_stats.setdefault('first_cut', time.perf_counter() - self.__created_time)
+        if prepared.keys is not None:
+            predicted = {}
+            for key, words in zip(prepared.missed_keys, decoded):
+                if model_spans:
+                    words.setflags(write=False)  # 缓存中的区间数组为共享只读
+                predicted[key] = words if model_spans else tuple(words)
+                self.__cache.put(key, predicted[key])
+            decoded = [words if words is not None else predicted[key]
+                       for key, words in zip(prepared.keys, prepared.results)]
+            if not model_spans:
+                decoded = [list(words) for words in decoded]
+        if prepared.layout is None:
+            return decoded
+        with self.__timer('postprocess_seconds'):
+            merged = merge_spans(prepared.layout, decoded)
+            return merged if prepared.spans else list(map(spans2words, prepared.texts, merged))
+
+    def _get_emissions(self, texts, char_ids, backend, backend_key):
+        """
+        获取不含词典干预的发射分数，开启缓存时只有未命中的句子进行模型预测
+        :param texts: 格式化后的字符串列表
+        :param char_ids: char id矩阵
+        :param backend: 推理后端
+        :param backend_key: 推理后端配置，作为缓存键的一部分
+        :return: 发射分数[batch, max_len, 5]
+        """
+        if self.__emission_cache is None:
+            return backend.emissions(char_ids)
+        keys = [(text, backend_key) for text in texts]
+        cached = self.__emission_cache.get_many(keys)
+        # 同一句子在batch中多次出现时（如使用不同词典）只预测一次
+        first_missed = collections.OrderedDict()
+        for idx, emission in enumerate(cached):
+            if emission is None:
+                first_missed.setdefault(keys[idx], idx)
+        missed = list(first_missed.values())
+        if missed:
+            max_len = max(len(texts[idx]) for idx in missed)
+            predicted = {}
+            for idx, emission in zip(missed, backend.emissions(char_ids[missed, :max_len])):
+                predicted[keys[idx]] = emission[:len(texts[idx])].copy()
+                self.__emission_cache.put(keys[idx], predicted[keys[idx]])
+            cached = [predicted[key] if emission is None else emission for key, emission in zip(keys, cached)]
+        emissions = np.zeros(char_ids.shape + (len(Tag),), dtype=cached[0].dtype)
+        for idx, emission in enumerate(cached):
+            emissions[idx, :len(emission)] = emission
+        return emissions
+
+    def _cut_documents(self, documents, n_jobs, length_bucketing, pipeline):
+        """
+        长文本分词：切分为片段后批量分词，再按文本拼接分词结果
+        :param documents: 待分词字符串列表
+        :param n_jobs: 进程数量
+        :param length_bucketing: 是否按长度分桶组batch
+        :param pipeline: 是否使用流水线
+        :return: 分词结果
+        """
+        chunks = []
+        owners = []
+        for idx, document in enumerate(documents):
+            text = format_string(document, max_length=None)
+            for chunk in split_text(text, protected_spans=self._get_lexicon().get_spans(text)):
+                if chunk.strip():
+                    chunks.append(chunk)
+                    owners.append(idx)
+        results = [[] for _ in documents]
+        for idx, words in zip(owners, self.cut(chunks, n_jobs, length_bucketing, pipeline=pipeline)):
+            results[idx].extend(words)
+        return results
+
+    def cut(self, text_or_list, n_jobs=None, length_bucketing=False, split_long_text=False, pipeline=False):
         """
         分词函数，支持传入字符串或者字符串列表
         :param text_or_list: 待分词字符串或者字符串列表
-        :param n_jobs: 进程数量，默认为1，不开启多进程
+        :param n_jobs: 进程数量，默认为None，使用调优配置中的进程数，未使用调优配置时为1，不开启多进程
+        :param length_bucketing: 是否按长度分桶组batch，长短文本混合时可减少padding计算，结果顺序与输入一致
+        :param split_long_text: 是否开启长文本模式，开启后文本按标点切分为不超过document_chunk_length的片段分词，
+                                不再受max_string_length限制
+        :param pipeline: 是否使用流水线，单进程时预处理、模型预测和后处理在不同线程中重叠执行，多进程时无效
         :return: 分词结果
         """
-        if n_jobs <= 0:
-            raise ThreadNumberException()
-        if isinstance(text_or_list, str):
+        n_jobs = self._get_n_jobs(n_jobs)
+        if split_long_text and isinstance(text_or_list, str):
+            return self._cut_documents([text_or_list], n_jobs, length_bucketing, pipeline)[0]
+        elif split_long_text and isinstance(text_or_list, list):
+            return self._cut_documents(text_or_list, n_jobs, length_bucketing, pipeline)
+        elif isinstance(text_or_list, str):
             return self._cut([text_or_list])[0]
+        elif isinstance(text_or_list, list) and length_bucketing:
+            with self.__timer('format_seconds'):
+                texts = normalize_batch(text_or_list)
+            return self._tokenize_texts(texts, n_jobs, length_bucketing, pipeline)
         elif isinstance(text_or_list, list):
-            generator = batch_generator(text_or_list, size=configs['tokenizer_limit']['max_batch_size'])
-            if n_jobs == 1:
-                return list(itertools.chain.from_iterable([self._cut(batch) for batch in generator]))
-            else:
-                process_pool = Pool(n_jobs)
-                res = process_pool.map(self._cut, generator)
-                process_pool.close()
-                return list(itertools.chain.from_iterable(res))
+            generator = batch_generator(text_or_list, size=self.__batch_size)
+            return list(itertools.chain.from_iterable(self._run_batches(generator, n_jobs, pipeline)))
         else:
             raise UnSupportedException()
 
+    def _tokenize_texts(self, texts, n_jobs, length_bucketing, pipeline, spans=False):
+        """
+        对格式化后的字符串列表分批分词
+        :param texts: 格式化后的字符串列表
+        :param n_jobs: 进程数量
+        :param length_bucketing: 是否按长度分桶组batch
+        :param pipeline: 是否使用流水线
+        :param spans: 是否返回词的区间数组
+        :return: 分词结果，顺序与输入一致
+        """
+        if not length_bucketing:
+            batches = batch_generator(texts, size=self.__batch_size)
+            return list(itertools.chain.from_iterable(self._run_batches(batches, n_jobs, pipeline, False, spans)))
+        buckets = list(length_bucket_generator(texts, size=self.__batch_size))
+        batch_results = self._run_batches([b for _, b in buckets], n_jobs, pipeline, False, spans)
+        results = [None] * len(texts)
+        for (indices, _), batch_result in zip(buckets, batch_results):
+            for idx, words in zip(indices, batch_result):
+                results[idx] = words
+        return results
+
+    def _cut_documents_spans(self, documents, n_jobs, length_bucketing, pipeline):
+        """
+        长文本区间分词：切分为片段后批量分词，再将片段内的区间映射回原文本
+        :param documents: 待分词字符串列表
+        :param n_jobs: 进程数量
+        :param length_bucketing: 是否按长度分桶组batch
+        :param pipeline: 是否使用流水线
+        :return: 每个文本的区间数组列表
+        """
+        chunks = []
+        owners = []
+        chunk_starts = []
+        document_offsets = []
+        for idx, document in enumerate(documents):
+            text, offsets = format_string_with_offsets(document, max_length=None)
+            document_offsets.append(offsets)
+            start = 0
+            for chunk in split_text(text, protected_spans=self._get_lexicon().get_spans(text)):
+                if chunk.strip():
+                    chunks.append(chunk)
+                    owners.append(idx)
+                    chunk_starts.append(start)
+                start += len(chunk)
+        results = [[] for _ in documents]
+        chunk_spans = self.cut_spans(chunks, n_jobs, length_bucketing, pipeline=pipeline)
+        for idx, start, spans in zip(owners, chunk_starts, chunk_spans):
+            results[idx].append(map_spans(spans + start, document_offsets[idx]))
+        return [np.concatenate(parts) for parts in results]
+
+    def cut_spans(self, text_or_list, n_jobs=None, length_bucketing=False, split_long_text=False, pipeline=False):
+        """
+        区间分词函数，返回每个词在输入字符串中的区间，区间对应未经全角转换、空白合并的原始输入
+        :param text_or_list: 待分词字符串或者字符串列表
+        :param n_jobs: 进程数量，默认为None，使用调优配置中的进程数，未使用调优配置时为1，不开启多进程
+        :param length_bucketing: 是否按长度分桶组batch
+        :param split_long_text: 是否开启长文本模式
+        :param pipeline: 是否使用流水线
+        :return: 区间数组，形状为[词数, 2]，每行为(start, end)，text[start:end]为对应的词；传入列表时返回区间数组列表
+        """
+        n_jobs = self._get_n_jobs(n_jobs)
+        if isinstance(text_or_list, str):
+            return self.cut_spans([text_or_list], n_jobs, length_bucketing, split_long_text, pipeline)[0]
+        if not isinstance(text_or_list, list):
+            raise UnSupportedException()
+        if split_long_text:
+            return self._cut_documents_spans(text_or_list, n_jobs, length_bucketing, pipeline)
+        with self.__timer('format_seconds'):
+            texts, offsets = zip(*map(format_string_with_offsets, text_or_list)) if text_or_list else ((), ())
+        results = self._tokenize_texts(list(texts), n_jobs, length_bucketing, pipeline, spans=True)
+        return list(map(map_spans, results, offsets))
+
+    def _cut_multi(self, text_batch, granularities, nested, executor):
+        """
+        多粒度分词：格式化、快速路径预切分、词典匹配和生成模型输入只执行一次，各粒度的模型在线程池中并行预测
+        :param text_batch: 待分词字符串列表
+        :param granularities: 分词粒度列表
+        :param nested: 是否返回嵌套结构
+        :param executor: 模型预测使用的线程池
+        :return: 分词结果
+        """
+        with self.__timer('format_seconds'):
+            texts = normalize_batch(text_batch)
+        prepared = self._prepare(texts, spans=True, use_cache=False)
+        futures = [executor.submit(self._infer, prepared, granularity) for granularity in granularities]
+        results = dict((granularity, self._decode(prepared, future.result()))
+                       for granularity, future in zip(granularities, futures))
+        if nested:
+            return list(map(nest_spans, texts, results['coarse'], results['fine']))
+        return [dict((granularity, spans2words(text, results[granularity][idx])) for granularity in granularities)
+                for idx, text in enumerate(texts)]
+
+    def cut_multi(self, text_or_list, granularities=('fine', 'coarse'), nested=False):
+        """
+        多粒度分词函数，一次调用返回多个粒度的分词结果，预处理只执行一次，各粒度的模型并行预测，
+        不使用分词结果缓存，词典干预与当前分词器一致
+        :param text_or_list: 待分词字符串或者字符串列表
+        :param granularities: 分词粒度列表，默认为('fine', 'coarse')
+        :param nested: 是否返回嵌套结构，为True时granularities须包含fine和coarse，
+                       返回[(粗粒度词, 其包含的细粒度词列表)]，跨越粗粒度词边界的细粒度词在边界处截断
+        :return: {分词粒度: 分词结果}或嵌套结构；传入列表时返回对应的列表
+        """
+        granularities = list(granularities)
+        if not granularities or any(g not in configs['tokenizer_granularity'] for g in granularities):
+            raise UnSupportedException()
+        if nested and not {'fine', 'coarse'}.issubset(granularities):
+            raise UnSupportedException()
+        if isinstance(text_or_list, str):
+            return self.cut_multi([text_or_list], granularities, nested)[0]
+        if not isinstance(text_or_list, list):
+            raise UnSupportedException()
+        results = []
+        with ThreadPoolExecutor(len(granularities)) as executor:
+            for batch in batch_generator(text_or_list, size=self.__batch_size):
+                results.extend(self._cut_multi(batch, granularities, nested, executor))
+        return results
+
+    def cut_tenants(self, text_or_list, lexicon_id):
+        """
+        多租户分词函数，每条文本使用词典ID对应的用户词典，使用不同词典的文本在同一个batch中预测，
+        每行的干预权重由各自的词典和干预强度生成
+        :param text_or_list: 待分词字符串或者字符串列表
+        :param lexicon_id: 词典ID，或与文本一一对应的词典ID列表，None表示分词器自己的用户词典
+        :return: 分词结果
+        """
+        if isinstance(text_or_list, str):
+            return self.cut_tenants([text_or_list], [lexicon_id])[0]
+        if not isinstance(text_or_list, list):
+            raise UnSupportedException()
+        lexicon_ids = lexicon_id if isinstance(lexicon_id, list) else [lexicon_id] * len(text_or_list)
+        if len(lexicon_ids) != len(text_or_list):
+            raise UnSupportedException()
+        size = self.__batch_size
+        results = []
+        for start in range(0, len(text_or_list), size):
+            with self.__timer('format_seconds'):
+                texts = normalize_batch(text_or_list[start:start + size])
+            results.extend(self._tokenize(texts, lexicon_ids=lexicon_ids[start:start + size]))
+        return results
+
+    def cut_iter(self, iterable, batch_size=None, n_jobs=None, pipeline=False):
+        """
+        流式分词函数，惰性读取输入并按输入顺序逐条返回结果，内存占用与输入规模无关，空行返回空列表
+        :param iterable: 待分词字符串的可迭代对象，传入文件对象时按行分词
+        :param batch_size: 每个batch的大小，默认为None，使用分词器的batch大小
+        :param n_jobs: 进程数量，默认为None，使用调优配置中的进程数，未使用调优配置时为1，不开启多进程
+        :param pipeline: 是否使用流水线
+        :return: 迭代器，每次返回一条文本的分词结果
+        """
+        # 参数在调用时立即检查，而不是推迟到第一次取结果
+        n_jobs = self._get_n_jobs(n_jobs)
+        batch_size = batch_size or self.__batch_size
+        if batch_size > configs['tokenizer_limit']['max_batch_size']:
+            raise MaxBatchException(batch_size)
+        if isinstance(iterable, str) or not isinstance(iterable, Iterable):
+            raise UnSupportedException()
+        if isinstance(iterable, io.IOBase):
+            iterable = (line.rstrip('\r\n') for line in iterable)
+        return self._cut_iter(iterable, batch_size, n_jobs, pipeline)
+
+    def _cut_iter(self, iterable, batch_size, n_jobs, pipeline):
+        """
+        cut_iter的生成器部分，输入中出现非字符串时抛出UnSupportedException
+        :param iterable: 待分词字符串的可迭代对象
+        :param batch_size: 每个batch的大小
+        :param n_jobs: 进程数量
+        :param pipeline: 是否使用流水线
+        :return: 迭代器，每次返回一条文本的分词结果
+        """
+        def check(text):
+            if not isinstance(text, str):
+                raise UnSupportedException()
+            return text
+
+        items, texts = itertools.tee(map(check, iterable))
+        generator = batch_generator((text for text in texts if not is_blank(text)), size=batch_size)
+        results = itertools.chain.from_iterable(self._run_batches(generator, n_jobs, pipeline))
+        for text in items:
+            yield [] if is_blank(text) else next(results)
+
+    def cut_file(self, input_path, output_path, n_jobs=None, encoding='UTF-8', pipeline=False):
+        """
+        文件分词函数，逐行分词并以空格分隔写入输出文件，空行原样保留
+        :param input_path: 输入文件路径
+        :param output_path: 输出文件路径
+        :param n_jobs: 进程数量，默认为None，使用调优配置中的进程数，未使用调优配置时为1，不开启多进程
+        :param encoding: 文件编码
+        :param pipeline: 是否使用流水线
+        """
+        with open(input_path, encoding=encoding) as fin, open(output_path, 'w', encoding=encoding) as fout:
+            for words in self.cut_iter(fin, n_jobs=n_jobs, pipeline=pipeline):
+                fout.write(' '.join(words) + '\n')
+
+    def cache_info(self):
+        """
+        分词结果缓存统计信息
+        :return: 命中数、未命中数、当前条数和最大条数，未开启缓存时返回None
+        """
+        return self.__cache.info() if self.__cache is not None else None
+
+    def metrics_info(self):
+        """
+        性能指标：histograms为当前进程中各阶段耗时、batch大小和padding比例的直方图，gauges为缓存和进程池统计，
+        可直接传给minlptokenizer.metrics.prometheus_text；多进程分词时worker中的阶段指标只通过hooks上报
+        :return: {'histograms': ..., 'gauges': ...}，未开启指标统计时返回None
+        """
+        if self.__metrics is None:
+            return None
+        gauges = {'pool_size': self.__pool_size}
+        for prefix, cache in (('cache', self.__cache), ('emission_cache', self.__emission_cache)):
+            if cache is not None:
+                gauges.update(('%s_%s' % (prefix, key), value) for key, value in cache.info().items())
+        return {'histograms': self.__metrics.snapshot(), 'gauges': gauges}
+
+    def add_word(self, word):
+        """
+        添加用户词典干预词，只重建增量部分
+        :param word: 干预词
+        """
+        self._get_lexicon().add_word(word)
+        self.close()
+
+    def add_words(self, file_or_list):
+        """
+        添加用户词典文件或者词列表
+        :param file_or_list: 文件路径或者词列表
+        """
+        self._get_lexicon().add_words(file_or_list)
+        self.close()
+
+    def remove_word(self, word):
+        """
+        删除用户词典干预词
+        :param word: 干预词
+        """
+        self._get_lexicon().remove_word(word)
+        self.close()
+
+    def remove_words(self, file_or_list):
+        """
+        删除用户词典文件中的词或者词列表
+        :param file_or_list: 文件路径或者词列表
+        """
+        self._get_lexicon().remove_words(file_or_list)
+        self.close()
+
+    def set_user_dict(self, file_or_list):
+        """
+        替换整个用户词典：新词典构建完成后一次性切换，切换前的分词请求仍使用旧词典，干预强度保持不变
+        :param file_or_list: 用户自定义词典文件或列表
+        """
+        lexicon = self._build_lexicon(file_or_list)
+        lexicon.set_interfere_factor(self._get_lexicon().interfere_factor)
+        self.__file_or_list = file_or_list
+        self.__lexicon = lexicon
+        self.close()
+
     def set_interfere_factor(self, interfere_factor):
         """
         设置用户词典干预强度，值越大，分词结果越符合词典
         :param interfere_factor: 干预强度，默认值：2
        """
-        self.__lexicon.set_interfere_factor(interfere_factor)
+        self._get_lexicon().set_interfere_factor(interfere_factor)
+        self.close()  # 进程池中的词典为创建时的副本，需要重新创建
 
     def reset_interfere_factor(self):
         """
         重置用户词典干预强度为默认值：2
         """
-        self.__lexicon.reset_interfere_factor()
+        self._get_lexicon().reset_interfere_factor()
+        self.close()
@@ -0,0 +1,96 @@
+# Copyright 2020 The MiNLP Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import numpy as np
+
+try:
+    from multiprocessing import shared_memory, resource_tracker
+except ImportError:  # Python 3.8以下不支持共享内存，退化为序列化传输
+    shared_memory = None
+
+# 小于该字节数的数组直接序列化传输，共享内存的创建和映射开销不划算
+SHARED_MEMORY_THRESHOLD = 1 << 16
+
+
+def prepare_pool():
+    """
+    创建进程池之前启动resource tracker，使worker与主进程共用同一个tracker：
+    worker创建、主进程释放的共享内存能够正确登记，进程退出时未释放的共享内存也会被清理
+    """
+    if shared_memory is not None:
+        resource_tracker.ensure_running()
+
+
+def _attach_shared_array(name, shape, dtype):
+    block = shared_memory.SharedMemory(name=name)
+    try:
+        array = np.ndarray(shape, dtype=dtype, buffer=block.buf).copy()
+    finally:
+        block.close()
+        block.unlink()
+    return SharedArray(array)
+
+
+class SharedArray:
+    def __init__(self, array):
+        """
+        跨进程传输时通过共享内存传递数据的numpy数组，接收方读取后释放共享内存
+        :param array: numpy数组
+        """
+        self.array = array
+
+    def __reduce__(self):
+        if shared_memory is None or self.array.nbytes < SHARED_MEMORY_THRESHOLD:
+            return SharedArray, (self.array,)
+        block = shared_memory.SharedMemory(create=True, size=self.array.nbytes)
+        np.ndarray(self.array.shape, dtype=self.array.dtype, buffer=block.buf)[...] = self.array
+        block.close()
+        return _attach_shared_array, (block.name, self.array.shape, self.array.dtype.str)
+
+
+class WordBatch:
+    def __init__(self, results):
+        """
+        一个batch分词结果的紧凑表示：词之间以空格、文本之间以换行拼接为一个字符串，词中不含空白字符，
+        用于多进程分词时从worker返回结果，避免嵌套列表的序列化开销；主进程迭代时切分为词列表，分词接口返回前即全部还原
+        :param results: 分词结果，每条文本的词列表
+        """
+        self.size = len(results)
+        self.joined = '\n'.join(map(' '.join, results))
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self):
+        if not self.size:
+            return iter(())
+        return (line.split(' ') for line in self.joined.split('\n'))
+
+
+class SpanBatch:
+    def __init__(self, results):
+        """
+        一个batch区间分词结果的紧凑表示：所有区间存放在一个数组中，较大时通过共享内存传输
+        :param results: 每条文本的区间数组列表
+        """
+        self.bounds = np.zeros(len(results) + 1, dtype=np.int64)
+        np.cumsum([len(spans) for spans in results], out=self.bounds[1:])
+        self.spans = SharedArray(np.concatenate(results) if results else np.zeros((0, 2), dtype=np.int32))
+
+    def __len__(self):
+        return len(self.bounds) - 1
+
+    def __iter__(self):
+        spans = self.spans.array
+        return (spans[start:end] for start, end in zip(self.bounds[:-1].tolist(), self.bounds[1:].tolist()))
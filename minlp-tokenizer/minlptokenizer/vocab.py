@@ -13,6 +13,7 @@
 # limitations under the License.
 
 import codecs
+import numpy as np
 
 
 class Vocab:
@@ -27,15 +28,24 @@ class Vocab:
                 self.vocab_map[key.strip()] = idx
         self.oovCharID = self.vocab_map.get('[OOV]')
         self.padCharID = self.vocab_map.get('[PAD]')
+        # 单字符按unicode码位建立稠密查找表，末位及未登录码位均映射为OOV
+        max_code = max(ord(key) for key in self.vocab_map if len(key) == 1)
+        self.char_table = np.full(max_code + 2, self.oovCharID, dtype=np.int32)
+        for key, idx in self.vocab_map.items():
+            if len(key) == 1:
+                self.char_table[ord(key)] = idx
 
-    def get_char_ids(self, text_list):
+    def get_char_ids(self, text_list, dtype=np.int32):
         """
         获取文本对应charid
         :param text_list:文本集合
-        :return:id集合
+        :param dtype: id矩阵的数据类型，与模型char_ids_batch输入保持一致
+        :return:id矩阵，不足最大长度的部分以PAD补齐
         """
-        max_len = max(map(len, text_list))
-        return list(map(
-            lambda x: [self.vocab_map.get(c, self.oovCharID) for c in x] + [self.padCharID] * (max_len - len(x)),
-            text_list
-        ))
+        lengths = np.fromiter(map(len, text_list), dtype=np.int64, count=len(text_list))
+        char_ids = np.full([len(text_list), lengths.max()], self.padCharID, dtype=dtype)
+        # 整个batch拼接后一次性转换为码位并查表，按行优先顺序填入非padding位置
+        codes = np.frombuffer(''.join(text_list).encode('utf-32-le', 'surrogatepass'), dtype=np.uint32)
+        mask = np.arange(char_ids.shape[1]) < lengths[:, np.newaxis]
+        char_ids[mask] = self.char_table[np.minimum(codes, self.char_table.size - 1)]
+        return char_ids
@@ -47,6 +47,9 @@ setup(
     package_data={'minlptokenizer': ['model/zh/*', 'vocab/*', 'lexicon/*', 'trans/*']},
     zip_safe=False,
     install_requires=install_requires,
+    extras_require={'onnx': ['onnxruntime'], 'export': ['tf2onnx']},
+    entry_points={'console_scripts': ['minlp-tokenize=minlptokenizer.cli:main',
+                                      'minlp-autotune=minlptokenizer.autotune:main']},
     classifiers=[
         'License :: OSI Approved :: Apache Software License',
         'Programming Language :: Python :: 3',
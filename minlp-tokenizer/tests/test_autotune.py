@@ -0,0 +1,66 @@
+# Copyright 2020 The MiNLP Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import json
+import shutil
+import tempfile
+import unittest
+from minlptokenizer.tokenizer import MiNLPTokenizer
+from minlptokenizer.autotune import autotune, load_profile, save_profile
+
+
+class TestAutotune(unittest.TestCase):
+    """
+    参数自动调优测试
+    """
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'profile.json')
+        self.profile = {'n_jobs': 1, 'intra_op_threads': 1, 'inter_op_threads': 1, 'max_batch_size': 16}
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_save_and_load(self):
+        save_profile(self.profile, 'tf', 'fine', self.path)
+        save_profile(dict(self.profile, max_batch_size=32), 'tf', 'coarse', self.path)
+        self.assertDictEqual(load_profile(self.path, 'tf', 'fine'), self.profile)
+        self.assertEqual(load_profile(self.path, 'tf', 'coarse')['max_batch_size'], 32)
+        self.assertDictEqual(load_profile(self.path, 'onnx', 'fine'), {})
+        self.assertDictEqual(load_profile(os.path.join(self.dir, 'missing.json')), {})
+
+    def test_machine_mismatch(self):
+        save_profile(self.profile, 'tf', 'fine', self.path)
+        with open(self.path, encoding='UTF-8') as fin:
+            data = json.load(fin)
+        data['machine']['cpus'] += 1
+        with open(self.path, 'w', encoding='UTF-8') as fout:
+            json.dump(data, fout)
+        # 其他机器上的调优结果不生效
+        self.assertDictEqual(load_profile(self.path, 'tf', 'fine'), {})
+
+    def test_autotune(self):
+        texts = ['今天天气怎么样？', '小米智能音箱'] * 20
+        profile = autotune(texts, batch_sizes=[8, 16], n_jobs_list=[1, 2], repeat=1, output_path=self.path)
+        self.assertIn(profile['max_batch_size'], (8, 16))
+        self.assertIn(profile['n_jobs'], (1, 2))
+        self.assertSetEqual(set(trial['n_jobs'] for trial in profile['trials']), {1, 2})  # 多进程参数在新进程中测量
+        self.assertEqual(load_profile(self.path)['max_batch_size'], profile['max_batch_size'])
+        tokenizer = MiNLPTokenizer(profile=self.path)
+        self.assertListEqual(tokenizer.cut(texts), MiNLPTokenizer().cut(texts))
+
+
+if __name__ == '__main__':
+    unittest.main()
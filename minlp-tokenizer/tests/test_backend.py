@@ -0,0 +1,56 @@
+# Copyright 2020 The MiNLP Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import os
+import random
+import unittest
+import numpy as np
+from minlptokenizer.backend import get_backend
+from minlptokenizer.config import configs
+from minlptokenizer.tokenizer import MiNLPTokenizer, normalize_batch
+
+
+class TestBackend(unittest.TestCase):
+    """
+    ONNX Runtime与TensorFlow推理结果一致性测试，需要安装onnxruntime并通过backend.export_onnx转换模型
+    """
+    def setUp(self):
+        try:
+            import onnxruntime  # noqa: F401
+        except ImportError:
+            self.skipTest('onnxruntime未安装')
+        src_dir = os.path.join(os.path.dirname(__file__), '../minlptokenizer')
+        for model_config in configs['tokenizer_granularity'].values():
+            if not os.path.exists(os.path.join(src_dir, model_config['onnx_model'])):
+                self.skipTest('onnx模型不存在')
+        with open(os.path.join(src_dir, configs['vocab_path']), encoding='utf-8') as fin:
+            chars = [line.strip() for line in fin if len(line.strip()) == 1]
+        random.seed(0)
+        self.texts = normalize_batch(['粗细粒度的区别包括三点十分2020年1月1日等。', '小米的价值观是真诚与热爱'] + [
+            ''.join(random.choice(chars) for _ in range(random.randint(1, 200))) for _ in range(126)
+        ])
+
+    def test_parity(self):
+        for granularity in configs['tokenizer_granularity']:
+            tokenizer = MiNLPTokenizer(['粗细粒度'], granularity=granularity)
+            tags = []
+            for name in ('tf', 'onnx'):
+                backend = get_backend(name, granularity, intra_op_threads=1, inter_op_threads=1)
+                tags.append(backend.predict(*tokenizer._encode(self.texts, backend)))
+            np.testing.assert_array_equal(tags[0], tags[1])
+
+
+if __name__ == '__main__':
+    unittest.main()
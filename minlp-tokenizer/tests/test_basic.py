@@ -13,7 +13,10 @@
 # limitations under the License.
 
 import unittest
+import os
+import tempfile
 from minlptokenizer.tokenizer import MiNLPTokenizer
+from minlptokenizer.exception import MaxBatchException, ThreadNumberException, UnSupportedException
 
 
 class TestBasic(unittest.TestCase):
@@ -44,6 +47,61 @@ class TestBasic(unittest.TestCase):
             [['粗细', '粒度', '的', '区别', '包括', '三点', '十分', '2020年', '1月', '1日', '等', '。']] * 10
         )
 
+    def test_length_bucketing(self):
+        tokenizer = MiNLPTokenizer(granularity='fine')
+        texts = ['今天天气怎么样', self.case * 20, '小米的价值观是真诚与热爱', self.case]
+        self.assertListEqual(tokenizer.cut(texts, length_bucketing=True), tokenizer.cut(texts))
+
+    def test_cut_iter(self):
+        tokenizer = MiNLPTokenizer(granularity='fine')
+        self.assertListEqual(
+            list(tokenizer.cut_iter(iter(self.case_list), batch_size=3)),
+            tokenizer.cut(self.case_list)
+        )
+        with tempfile.TemporaryFile('w+', encoding='UTF-8') as fin:
+            fin.write(self.case + '\n\n  \n' + self.case + '\n')
+            fin.seek(0)
+            # 文件中的空行与cut_file一致，返回空结果
+            expected = tokenizer.cut(self.case)
+            self.assertListEqual(list(tokenizer.cut_iter(fin)), [expected, [], [], expected])
+
+    def test_cut_iter_errors(self):
+        tokenizer = MiNLPTokenizer(granularity='fine')
+        # 参数错误在调用时抛出，不必等到取第一条结果
+        with self.assertRaises(MaxBatchException):
+            tokenizer.cut_iter(self.case_list, batch_size=100000)
+        with self.assertRaises(UnSupportedException):
+            tokenizer.cut_iter(self.case)
+        with self.assertRaises(ThreadNumberException):
+            tokenizer.cut_iter(self.case_list, n_jobs=0)
+        with self.assertRaises(UnSupportedException):
+            list(tokenizer.cut_iter([self.case, 1]))
+
+    def test_split_long_text(self):
+        tokenizer = MiNLPTokenizer(granularity='fine')
+        document = (self.case + '\n') * 100
+        self.assertListEqual(
+            tokenizer.cut(document, split_long_text=True),
+            tokenizer.cut(self.case) * 100
+        )
+
+    def test_cache(self):
+        tokenizer = MiNLPTokenizer(granularity='fine', cache_size=16)
+        expected = tokenizer.cut(self.case)
+        self.assertListEqual(tokenizer.cut(self.case_list), [expected] * 10)
+        self.assertEqual(tokenizer.cache_info()['hits'], 10)
+        tokenizer.set_interfere_factor(3)
+        tokenizer.cut(self.case)
+        self.assertEqual(tokenizer.cache_info()['size'], 1)
+
+    def test_warmup(self):
+        tokenizer = MiNLPTokenizer(granularity='fine')
+        stats = tokenizer.warmup()
+        for key in ('vocab_load', 'lexicon_load', 'model_load', 'cold_start'):
+            self.assertIn(key, stats)
+        tokenizer.cut(self.case)
+        self.assertIn('first_cut', tokenizer.startup_stats())
+
     def test_user_dict(self):
         tokenizer = MiNLPTokenizer(['粗细粒度'])
         self.assertEqual(
@@ -51,6 +109,28 @@ class TestBasic(unittest.TestCase):
             ['粗细粒度', '的', '区别', '包括', '三', '点', '十', '分', '2020', '年', '1', '月', '1', '日', '等', '。']
         )
 
+    def test_cut_file(self):
+        tokenizer = MiNLPTokenizer(granularity='fine')
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            input_path = os.path.join(tmp_dir, 'input.txt')
+            output_path = os.path.join(tmp_dir, 'output.txt')
+            with open(input_path, 'w', encoding='UTF-8') as fout:
+                fout.write('今天天气怎么样\n\n' + self.case + '\n')
+            tokenizer.cut_file(input_path, output_path)
+            with open(output_path, encoding='UTF-8') as fin:
+                self.assertListEqual(fin.read().splitlines(), [
+                    '今天 天气 怎么样',
+                    '',
+                    '粗细 粒度 的 区别 包括 三 点 十 分 2020 年 1 月 1 日 等 。'
+                ])
+
+    def test_update_user_dict(self):
+        tokenizer = MiNLPTokenizer(['粗细粒度'])
+        tokenizer.remove_word('粗细粒度')
+        self.assertEqual(tokenizer.cut(self.case)[:2], ['粗细', '粒度'])
+        tokenizer.set_user_dict(['粗细粒度'])
+        self.assertEqual(tokenizer.cut(self.case)[0], '粗细粒度')
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,44 @@
+# Copyright 2020 The MiNLP Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import unittest
+from minlptokenizer.tokenizer import batch_generator, length_bucket_generator
+
+
+class TestBatch(unittest.TestCase):
+    """
+    batch生成测试
+    """
+    def setUp(self):
+        self.texts = ['a' * 1000] + ['b' * 10] * 200 + ['c' * 5] * 3
+
+    def test_batch_generator(self):
+        batches = list(batch_generator(self.texts, size=128))
+        self.assertListEqual(list(map(len, batches)), [128, 76])
+
+    def test_length_bucket_generator(self):
+        buckets = list(length_bucket_generator(self.texts, max_tokens=1024, size=128))
+        indices = [idx for batch_indices, _ in buckets for idx in batch_indices]
+        self.assertListEqual(sorted(indices), list(range(len(self.texts))))
+        for batch_indices, batch in buckets:
+            self.assertListEqual(batch, [self.texts[i] for i in batch_indices])
+            self.assertLessEqual(len(batch), 128)
+            # 超长文本单独成batch，其余batch补齐后不超过max_tokens
+            self.assertTrue(len(batch) == 1 or len(batch) * max(map(len, batch)) <= 1024)
+        self.assertListEqual(buckets[-1][1], ['a' * 1000])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+# Copyright 2020 The MiNLP Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import time
+import unittest
+from minlptokenizer.cache import LRUCache
+
+
+class TestCache(unittest.TestCase):
+    """
+    LRU缓存测试
+    """
+    def test_lru(self):
+        cache = LRUCache(2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        self.assertEqual(cache.get('a'), 1)
+        cache.put('c', 3)  # 淘汰最久未使用的b
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('c'), 3)
+        self.assertDictEqual(cache.info(), {'hits': 2, 'misses': 1, 'size': 2, 'max_size': 2})
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+
+    def test_get_many(self):
+        cache = LRUCache(4)
+        cache.put('a', 1)
+        # 同一批中重复的未命中键只计算一次，只计一次未命中
+        self.assertListEqual(cache.get_many(['a', 'b', 'b', 'c', 'b']), [1, None, None, None, None])
+        self.assertDictEqual(cache.info(), {'hits': 3, 'misses': 2, 'size': 1, 'max_size': 4})
+
+    def test_ttl(self):
+        cache = LRUCache(2, ttl=0.01)
+        cache.put('a', 1)
+        time.sleep(0.02)
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(len(cache), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
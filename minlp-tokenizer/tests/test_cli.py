@@ -0,0 +1,90 @@
+# Copyright 2020 The MiNLP Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import gzip
+import json
+import shutil
+import tempfile
+import unittest
+from minlptokenizer import cli
+from minlptokenizer.tokenizer import MiNLPTokenizer
+
+
+class TestCLI(unittest.TestCase):
+    """
+    命令行批量分词测试
+    """
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.lines = ['今天天气怎么样？', '', '小米的价值观是真诚与热爱', '  ', '粗细粒度的区别包括三点十分2020年1月1日等。'] * 20
+        os.makedirs(os.path.join(self.tmp_dir, 'input', 'sub'))
+        self.input_path = os.path.join(self.tmp_dir, 'input', 'a.txt')
+        with open(self.input_path, 'w', encoding='UTF-8') as fout:
+            fout.write('\n'.join(self.lines) + '\n')
+        with gzip.open(os.path.join(self.tmp_dir, 'input', 'sub', 'b.txt.gz'), 'wt', encoding='UTF-8') as fout:
+            fout.write('\n'.join(self.lines))
+        tokenizer = MiNLPTokenizer(granularity='fine')
+        self.expected = [' '.join(tokenizer.cut(line)) if line.strip() else '' for line in self.lines]
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def read_lines(self, path):
+        with open(path, encoding='UTF-8') as fin:
+            return fin.read().splitlines()
+
+    def test_read_shard(self):
+        size = os.path.getsize(self.input_path)
+        for shard_size in (1, 7, 64, size):
+            lines = [line for start in range(0, size, shard_size)
+                     for line in cli.read_shard(self.input_path, start, min(start + shard_size, size))]
+            self.assertListEqual(lines, self.lines)
+
+    def test_directory(self):
+        output = os.path.join(self.tmp_dir, 'output')
+        cli.main(['-q', '-j', '2', os.path.join(self.tmp_dir, 'input'), '-o', output])
+        self.assertListEqual(self.read_lines(os.path.join(output, 'a.txt')), self.expected)
+        self.assertListEqual(self.read_lines(os.path.join(output, 'sub', 'b.txt')), self.expected)
+
+    def test_formats(self):
+        output = os.path.join(self.tmp_dir, 'a.jsonl')
+        cli.main(['-q', '-j', '1', '-f', 'jsonl', self.input_path, '-o', output])
+        records = [json.loads(line) for line in self.read_lines(output)]
+        self.assertListEqual([' '.join(record['tokens']) for record in records], self.expected)
+        cli.main(['-q', '-j', '1', '-f', 'offsets', self.input_path, '-o', output])
+        spans = [json.loads(line) for line in self.read_lines(output)]
+        self.assertListEqual([' '.join(line[start:end] for start, end in line_spans)
+                              for line, line_spans in zip(self.lines, spans)], self.expected)
+
+    def test_resume(self):
+        output = os.path.join(self.tmp_dir, 'a.txt')
+        os.makedirs(output + cli.PARTS_SUFFIX)
+        with open(os.path.join(output + cli.PARTS_SUFFIX, 'part-000000'), 'w', encoding='UTF-8') as fout:
+            fout.write('done\n')  # 已完成的分片不再重新处理
+        cli.main(['-q', '--resume', self.input_path, '-o', output])
+        self.assertListEqual(self.read_lines(output), ['done'])
+        self.assertFalse(os.path.exists(output + cli.PARTS_SUFFIX))
+
+    def test_load_error(self):
+        output = os.path.join(self.tmp_dir, 'a.txt')
+        for argv in (['-u', os.path.join(self.tmp_dir, 'missing.txt'), self.input_path],
+                     [os.path.join(self.tmp_dir, 'missing.txt')]):
+            with self.assertRaises(SystemExit) as context:
+                cli.main(['-q', '-j', '2', '-o', output] + argv)
+            self.assertIn('missing.txt', str(context.exception.code))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,150 @@
+# Copyright 2020 The MiNLP Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import shutil
+import tempfile
+import itertools
+import unittest
+import numpy as np
+from minlptokenizer.backend import TFSessionBackend, find_crf_tensors
+from minlptokenizer.config import configs
+from minlptokenizer.crf import viterbi_decode
+from minlptokenizer.exception import UnSupportedException
+from minlptokenizer.tag import Tag
+from minlptokenizer.tokenizer import MiNLPTokenizer
+
+
+def brute_force(emissions, transitions):
+    best, best_path = None, None
+    for path in itertools.product(range(emissions.shape[1]), repeat=len(emissions)):
+        score = sum(emissions[t, tag] for t, tag in enumerate(path)) + \
+            sum(transitions[a, b] for a, b in zip(path, path[1:]))
+        if best is None or score > best:
+            best, best_path = score, list(path)
+    return best_path
+
+
+class TestCRF(unittest.TestCase):
+    """
+    维特比解码测试
+    """
+    def test_viterbi_decode(self):
+        rng = np.random.RandomState(0)
+        lengths = np.array([4, 1, 3])
+        emissions = rng.randn(3, 4, 5)
+        transitions = rng.randn(5, 5)
+        tags = viterbi_decode(emissions, transitions, lengths)
+        for row, length in enumerate(lengths):
+            self.assertListEqual(tags[row, :length].tolist(),
+                                 brute_force(emissions[row, :length], transitions))
+            self.assertTrue((tags[row, length:] == Tag.X.value).all())
+
+    def test_unsupported_backend(self):
+        with self.assertRaises(UnSupportedException):
+            MiNLPTokenizer(backend='onnx', decoder='numpy')  # 构造时即检查，不等到首次分词
+
+    def test_find_crf_tensors(self):
+        try:
+            import tensorflow as tf
+        except ImportError:
+            self.skipTest('tensorflow未安装')
+        graph = tf.Graph()
+        with graph.as_default():
+            char_ids = tf.compat.v1.placeholder(tf.int32, [None, None], name='char_ids_batch')
+            factor = tf.compat.v1.placeholder(tf.float32, [None, None, 5], name='factor_batch')
+            logits = tf.gather(tf.constant(np.eye(8, 5, dtype=np.float32)), char_ids)
+            transitions = tf.constant(np.zeros((5, 5), dtype=np.float32))
+            scores = logits + logits * factor  # 干预由多个逐元素运算组成
+            tag_ids = tf.argmax(scores + tf.reduce_sum(transitions), axis=-1, name='tag_ids')
+        emission, crf_input, transition = find_crf_tensors(graph, factor, tag_ids)
+        self.assertIs(emission, logits)
+        self.assertIs(crf_input.op.inputs[0], scores)
+        self.assertIs(transition, transitions)
+
+
+class TestSyntheticParity(unittest.TestCase):
+    """
+    在合成的计算图上测试Python侧解码与模型内解码结果一致，不依赖模型文件：
+    转移矩阵为0时维特比解码等价于逐位置取最大值
+    """
+    def setUp(self):
+        try:
+            import tensorflow as tf
+        except ImportError:
+            self.skipTest('tensorflow未安装')
+        self.tf = tf
+        self.tmp_dir = tempfile.mkdtemp()
+        rng = np.random.RandomState(0)
+        self.table = rng.randn(16, 5).astype(np.float32)
+        self.char_ids = rng.randint(1, 16, size=(4, 9)).astype(np.int32)
+        self.factor = (rng.rand(4, 9, 5) < 0.2) * 2.0
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def build_backend(self, interfere, transitions=np.zeros((5, 5))):
+        tf = self.tf
+        graph = tf.Graph()
+        with graph.as_default():
+            char_ids = tf.compat.v1.placeholder(tf.int32, [None, None], name='char_ids_batch')
+            factor = tf.compat.v1.placeholder(tf.float64, [None, None, 5], name='factor_batch')
+            logits = tf.gather(tf.constant(self.table), char_ids)
+            scores = interfere(logits, factor) + tf.reduce_sum(tf.constant(transitions, dtype=tf.float32)) * 0
+            tf.argmax(scores, axis=-1, output_type=tf.int32, name='tag_ids')
+        model_path = os.path.join(self.tmp_dir, 'model.pb')
+        with open(model_path, 'wb') as fout:
+            fout.write(graph.as_graph_def().SerializeToString())
+        return TFSessionBackend(model_path)
+
+    def test_parity(self):
+        tf = self.tf
+        for interfere in (lambda logits, factor: logits * (1 + tf.cast(factor, tf.float32)),
+                          lambda logits, factor: logits + logits * tf.cast(factor, tf.float32),
+                          lambda logits, factor: logits + tf.cast(factor * 0.5, tf.float32)):
+            backend = self.build_backend(interfere)
+            emissions = backend.emissions(self.char_ids)
+            tags = viterbi_decode(backend.interfere(self.char_ids, emissions, self.factor), backend.transitions(),
+                                  [self.char_ids.shape[1]] * len(self.char_ids))
+            np.testing.assert_array_equal(tags, backend.predict(self.char_ids, self.factor))
+
+    def test_mismatch(self):
+        # 模型输出不依赖找到的转移矩阵时无法在Python侧复现，加载时检查并拒绝
+        backend = self.build_backend(lambda logits, factor: logits + self.tf.cast(factor, self.tf.float32),
+                                     transitions=np.eye(5) * 100)
+        with self.assertRaises(UnSupportedException):
+            backend.emissions(self.char_ids)
+
+
+class TestDecoderParity(unittest.TestCase):
+    """
+    Python侧CRF解码与模型内解码结果一致性测试，需要模型文件
+    """
+    def setUp(self):
+        src_dir = os.path.join(os.path.dirname(__file__), '../minlptokenizer')
+        for model_config in configs['tokenizer_granularity'].values():
+            if not os.path.exists(os.path.join(src_dir, model_config['model'])):
+                self.skipTest('模型文件不存在')
+        self.texts = ['粗细粒度的区别包括三点十分2020年1月1日等。', '小米的价值观是真诚与热爱', '今天天气怎么样？'] * 3
+
+    def test_parity(self):
+        for granularity in configs['tokenizer_granularity']:
+            for file_or_list in (None, ['粗细粒度', '价值观是真诚']):
+                expected = MiNLPTokenizer(file_or_list, granularity=granularity).cut(self.texts)
+                tokenizer = MiNLPTokenizer(file_or_list, granularity=granularity, decoder='numpy')
+                self.assertListEqual(tokenizer.cut(self.texts), expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
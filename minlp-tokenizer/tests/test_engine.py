@@ -0,0 +1,49 @@
+# Copyright 2020 The MiNLP Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import asyncio
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from minlptokenizer.tokenizer import MiNLPTokenizer
+from minlptokenizer.engine import BatchingEngine
+
+
+class TestEngine(unittest.TestCase):
+
+    def setUp(self):
+        self.case = '粗细粒度的区别包括三点十分2020年1月1日等。'
+        self.expected = ['粗细', '粒度', '的', '区别', '包括', '三', '点', '十', '分', '2020', '年', '1', '月', '1', '日', '等', '。']
+
+    def test_concurrent_cut(self):
+        with BatchingEngine(MiNLPTokenizer(granularity='fine')) as engine:
+            with ThreadPoolExecutor(8) as executor:
+                results = list(executor.map(engine.cut, [self.case] * 64))
+        self.assertListEqual(results, [self.expected] * 64)
+
+    def test_async_cut(self):
+        with BatchingEngine(MiNLPTokenizer(granularity='fine')) as engine:
+            async def cut_all():
+                return await asyncio.gather(*[engine.acut(self.case) for _ in range(8)])
+
+            loop = asyncio.new_event_loop()
+            try:
+                results = loop.run_until_complete(cut_all())
+            finally:
+                loop.close()
+        self.assertListEqual(list(results), [self.expected] * 8)
+
+
+if __name__ == '__main__':
+    unittest.main()
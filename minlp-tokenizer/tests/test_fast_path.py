@@ -0,0 +1,49 @@
+# Copyright 2020 The MiNLP Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+from minlptokenizer.tokenizer import MiNLPTokenizer, fast_path_split
+
+
+class TestFastPath(unittest.TestCase):
+    """
+    快速路径测试
+    """
+    def test_fast_path_split(self):
+        text = '我用 iPhone12 访问 https://www.mi.com/a?b=1. 或 foo@xiaomi.com 下载 3.5G 的 50% 小米 MIX2s'
+        segments, rule_spans = fast_path_split(text)
+        self.assertListEqual([text[start:end] for start, end in segments], ['我用', '访问', '或', '下载', '的', '小米'])
+        self.assertListEqual([text[start:end] for start, end in rule_spans.tolist()],
+                             ['iPhone12', 'https://www.mi.com/a?b=1', '.', 'foo@xiaomi.com', '3.5G', '50%', 'MIX2s'])
+
+    def test_protected_spans(self):
+        # 与用户词典匹配的词重叠的片段交给模型，相邻的模型片段合并
+        text = 'QQ音乐 bilibili 是 video site'
+        segments, rule_spans = fast_path_split(text, protected_spans=[(16, 26)])
+        self.assertListEqual([text[start:end] for start, end in segments], ['QQ音乐', '是 video site'])
+        self.assertListEqual([text[start:end] for start, end in rule_spans.tolist()], ['bilibili'])
+
+    def test_cut(self):
+        tokenizer = MiNLPTokenizer(granularity='fine', fast_path=True)
+        reference = MiNLPTokenizer(granularity='fine')
+        self.assertListEqual(tokenizer.cut('hello world, 2020'), ['hello', 'world', ',', '2020'])
+        case = '粗细粒度的区别包括三点十分2020年1月1日等。'
+        self.assertListEqual(tokenizer.cut(case), reference.cut(case))
+        self.assertListEqual(tokenizer.cut('小米 MIX2s 发布'), reference.cut('小米') + ['MIX2s'] + reference.cut('发布'))
+        spans = tokenizer.cut_spans('小米 MIX2s 发布')
+        self.assertListEqual(spans[1].tolist(), [3, 8])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+# Copyright 2020 The MiNLP Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import unittest
+from minlptokenizer.tokenizer import format_string, normalize_batch, split_text
+from minlptokenizer.exception import ZeroLengthException, MaxLengthException
+
+
+class TestFormat(unittest.TestCase):
+    """
+    字符串格式化测试
+    """
+    def test_format_string(self):
+        self.assertEqual(format_string('　ＭＩＮＬＰ　２０２０\t\n年！ '), 'MINLP 2020 年！')
+        self.assertRaises(ZeroLengthException, format_string, ' 　\n')
+        self.assertRaises(MaxLengthException, format_string, '好' * 1025)
+
+    def test_normalize_batch(self):
+        texts = ['ＡＢＣ　１２３', '  今天  天气 ']
+        self.assertListEqual(normalize_batch(texts), ['ABC 123', '今天 天气'])
+
+    def test_split_text(self):
+        text = '今天天气很好。我们去公园玩吧！' + '一' * 20
+        self.assertListEqual(split_text(text, max_length=10), ['今天天气很好。', '我们去公园玩吧！', '一' * 10, '一' * 10])
+        self.assertListEqual(
+            split_text('一' * 20, max_length=10, protected_spans=[(8, 12)]),
+            ['一' * 8, '一' * 10, '一' * 2]
+        )
+        self.assertListEqual(split_text(text, max_length=100), [text])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+# Copyright 2020 The MiNLP Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import os
+import pickle
+import tempfile
+import unittest
+import numpy as np
+from minlptokenizer import lexicon as lexicon_module
+from minlptokenizer.lexicon import Lexicon
+from minlptokenizer.tag import Tag
+
+
+class TestLexicon(unittest.TestCase):
+    """
+    用户词典干预矩阵测试
+    """
+    def setUp(self):
+        self.lexicon = Lexicon(['小米', '米', '价值观', '真诚与热爱'])
+        self.lexicon.set_interfere_factor(3)
+
+    def test_get_factor(self):
+        texts = ['小米的价值观是真诚与热爱', '你好']
+        factor = self.lexicon.get_factor(texts)
+        self.assertEqual(factor.shape, (2, 12, len(Tag)))
+        expected = np.zeros(shape=factor.shape)
+        expected[0, 0, Tag.B.value] = expected[0, 1, Tag.E.value] = 3  # 小米
+        expected[0, 1, Tag.S.value] = 3  # 米
+        expected[0, 3, Tag.B.value] = expected[0, 4, Tag.M.value] = expected[0, 5, Tag.E.value] = 3  # 价值观
+        expected[0, 7, Tag.B.value] = expected[0, 11, Tag.E.value] = 3  # 真诚与热爱
+        expected[0, 8:11, Tag.M.value] = 3
+        np.testing.assert_array_equal(factor, expected)
+
+    def test_get_factor_dtype(self):
+        self.assertEqual(self.lexicon.get_factor(['你好'], dtype=np.float32).dtype, np.float32)
+        self.assertFalse(self.lexicon.get_factor(['你好']).any())
+
+    def test_compiled_lexicon(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            lexicon_path = os.path.join(tmp_dir, 'user.txt')
+            cache_dir = os.path.join(tmp_dir, 'cache')
+            with open(lexicon_path, 'w', encoding='UTF-8') as fout:
+                fout.write('# 注释\n小米\n\n价值观\n')
+            lexicon = Lexicon(lexicon_path, cache_dir=cache_dir)
+            self.assertEqual(len(os.listdir(cache_dir)), 1)
+            self.assertListEqual(sorted(lexicon.get_spans('小米的价值观')), [(0, 2), (3, 6)])
+            # 同一进程内相同内容的词典共享同一个自动机，序列化时不包含自动机
+            self.assertIs(Lexicon(lexicon_path, cache_dir=cache_dir).layers[0][2], lexicon.layers[0][2])
+            restored = pickle.loads(pickle.dumps(lexicon))
+            self.assertListEqual(sorted(restored.get_spans('小米的价值观')), [(0, 2), (3, 6)])
+
+    def test_corrupt_cache(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            lexicon_path = os.path.join(tmp_dir, 'user.txt')
+            cache_dir = os.path.join(tmp_dir, 'cache')
+            with open(lexicon_path, 'w', encoding='UTF-8') as fout:
+                fout.write('小米\n价值观\n')
+            Lexicon(lexicon_path, cache_dir=cache_dir)
+            cache_path = os.path.join(cache_dir, os.listdir(cache_dir)[0])
+            with open(cache_path, 'r+b') as fout:
+                fout.truncate(8)  # 模拟写入中断的缓存文件
+            lexicon_module._compiled_automata.clear()
+            lexicon = Lexicon(lexicon_path, cache_dir=cache_dir)
+            self.assertListEqual(sorted(lexicon.get_spans('小米的价值观')), [(0, 2), (3, 6)])
+            self.assertGreater(os.path.getsize(cache_path), 8)  # 损坏的文件被重新编译的结果替换
+
+    def test_remove_words_file(self):
+        lexicon = Lexicon(['小米', '价值观', '热爱'])
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            lexicon_path = os.path.join(tmp_dir, 'remove.txt')
+            with open(lexicon_path, 'w', encoding='UTF-8') as fout:
+                fout.write('小米\n热爱\n')
+            lexicon.remove_words(lexicon_path)  # 字符串参数为文件路径，而不是逐字删除
+        self.assertListEqual([word in lexicon for word in ('小米', '价值观', '热爱')], [False, True, False])
+        with self.assertRaises(IOError):
+            lexicon.remove_words('价值观')
+
+    def test_incremental_update(self):
+        lexicon = Lexicon(['小米', '价值观'], merge_threshold=2)
+        texts = ['小米的价值观是真诚与热爱']
+        lexicon.get_factor(texts)
+        lexicon.add_word('热爱')
+        lexicon.remove_words(['价值观', '真诚'])
+        self.assertNotIn('价值观', lexicon)
+        self.assertIn('热爱', lexicon)
+        rebuilt = Lexicon(['小米', '热爱'])
+        np.testing.assert_array_equal(lexicon.get_factor(texts), rebuilt.get_factor(texts))
+        lexicon.add_words(['是', '与'])  # 增量达到merge_threshold，合并到实例自动机
+        self.assertSetEqual(lexicon.added_words, set())
+        rebuilt = Lexicon(['小米', '热爱', '是', '与'])
+        np.testing.assert_array_equal(lexicon.get_factor(texts), rebuilt.get_factor(texts))
+
+
+if __name__ == '__main__':
+    unittest.main()
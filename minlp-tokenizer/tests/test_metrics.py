@@ -0,0 +1,57 @@
+# Copyright 2020 The MiNLP Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+from minlptokenizer.metrics import Metrics, prometheus_text
+from minlptokenizer.tokenizer import MiNLPTokenizer
+
+
+class TestMetrics(unittest.TestCase):
+    """
+    性能指标测试
+    """
+    def test_histogram(self):
+        observed = []
+        metrics = Metrics(hooks=[lambda name, value: observed.append(name)])
+        metrics.observe('batch_size', 3)
+        metrics.observe('batch_size', 300)
+        with metrics.timer('inference_seconds'):
+            pass
+        snapshot = metrics.snapshot()
+        self.assertEqual(snapshot['batch_size']['count'], 2)
+        self.assertEqual(snapshot['batch_size']['sum'], 303)
+        self.assertListEqual([count for _, count in snapshot['batch_size']['buckets']][2:4], [1, 1])
+        self.assertEqual(snapshot['batch_size']['buckets'][-1], (float('inf'), 2))
+        self.assertListEqual(observed, ['batch_size', 'batch_size', 'inference_seconds'])
+        text = prometheus_text(snapshot, {'pool_size': 0})
+        self.assertIn('minlp_batch_size_bucket{le="+Inf"} 2', text)
+        self.assertIn('minlp_inference_seconds_count 1', text)
+        self.assertIn('minlp_pool_size 0.0', text)
+        metrics.reset()
+        self.assertDictEqual(metrics.snapshot(), {})
+
+    def test_tokenizer_metrics(self):
+        self.assertIsNone(MiNLPTokenizer().metrics_info())
+        tokenizer = MiNLPTokenizer(metrics=Metrics(), cache_size=10)
+        tokenizer.cut(['今天天气怎么样？', '小米'])
+        info = tokenizer.metrics_info()
+        for stage in ('format', 'encode', 'lexicon', 'inference', 'postprocess'):
+            self.assertEqual(info['histograms'][stage + '_seconds']['count'], 1)
+        self.assertEqual(info['histograms']['batch_size']['sum'], 2)
+        self.assertAlmostEqual(info['histograms']['padding_ratio']['sum'], 6 / 16)
+        self.assertEqual(info['gauges']['cache_misses'], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
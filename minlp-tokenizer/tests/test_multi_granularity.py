@@ -0,0 +1,55 @@
+# Copyright 2020 The MiNLP Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+import numpy as np
+from minlptokenizer.tokenizer import MiNLPTokenizer, nest_spans
+from minlptokenizer.exception import UnSupportedException
+
+
+class TestMultiGranularity(unittest.TestCase):
+    """
+    多粒度分词测试
+    """
+    def setUp(self):
+        self.cases = ['粗细粒度的区别包括三点十分2020年1月1日等。', '小米的价值观是真诚与热爱'] * 100
+
+    def test_nest_spans(self):
+        text = '小米手机 发布会'
+        coarse = np.array([[0, 3], [3, 4], [5, 8]])
+        fine = np.array([[0, 2], [2, 4], [5, 7], [7, 8]])
+        # 跨越粗粒度词边界的细粒度词在边界处截断
+        self.assertListEqual(nest_spans(text, coarse, fine),
+                             [('小米手', ['小米', '手']), ('机', ['机']), ('发布会', ['发布', '会'])])
+
+    def test_cut_multi(self):
+        tokenizer = MiNLPTokenizer(file_or_list=['粗细粒度'])
+        results = tokenizer.cut_multi(self.cases)
+        for granularity in ('fine', 'coarse'):
+            expected = MiNLPTokenizer(file_or_list=['粗细粒度'], granularity=granularity).cut(self.cases)
+            self.assertListEqual([result[granularity] for result in results], expected)
+        nested = tokenizer.cut_multi(self.cases[0], nested=True)
+        self.assertListEqual([word for word, _ in nested], results[0]['coarse'])
+        self.assertListEqual([word for _, words in nested for word in words], results[0]['fine'])
+
+    def test_unsupported(self):
+        tokenizer = MiNLPTokenizer()
+        with self.assertRaises(UnSupportedException):
+            tokenizer.cut_multi('小米', granularities=['medium'])
+        with self.assertRaises(UnSupportedException):
+            tokenizer.cut_multi('小米', granularities=['fine'], nested=True)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -43,6 +43,32 @@ class TestMultiprocess(unittest.TestCase):
             [['粗细粒度', '的', '区别', '包括', '三', '点', '十', '分', '2020', '年', '1', '月', '1', '日', '等', '。']] * 256
         )
 
+    def test_reuse_pool(self):
+        with MiNLPTokenizer(granularity='fine') as tokenizer:
+            first = tokenizer.cut(self.case_list, n_jobs=2)
+            self.assertListEqual(tokenizer.cut(self.case_list, n_jobs=2), first)
+            self.assertListEqual(tokenizer.cut(self.case_list, n_jobs=2, length_bucketing=True), first)
+
+    def test_cache(self):
+        # 主进程查询缓存，只有未命中的文本提交给worker，结果写回主进程的缓存
+        texts = self.case_list + ['今天天气怎么样？']
+        with MiNLPTokenizer(granularity='fine') as tokenizer:
+            expected = tokenizer.cut(texts)
+        with MiNLPTokenizer(granularity='fine', cache_size=16) as tokenizer:
+            self.assertListEqual(tokenizer.cut(texts, n_jobs=2), expected)
+            misses = tokenizer.cache_info()['misses']
+            self.assertGreaterEqual(misses, 2)
+            self.assertListEqual(tokenizer.cut(texts, n_jobs=2), expected)
+            info = tokenizer.cache_info()
+            self.assertEqual(info['misses'], misses)  # 第二次分词全部命中主进程的缓存
+            self.assertEqual(info['size'], 2)
+
+    def test_load_error(self):
+        # worker加载失败时抛出异常，而不是不断重建worker
+        with MiNLPTokenizer(file_or_list='/nonexistent/lexicon.txt') as tokenizer:
+            with self.assertRaises(IOError):
+                tokenizer.cut(self.case_list, n_jobs=2)
+
 
 if __name__ == '__main__':
     unittest.main()
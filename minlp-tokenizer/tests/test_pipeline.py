@@ -0,0 +1,41 @@
+# Copyright 2020 The MiNLP Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+from minlptokenizer.tokenizer import MiNLPTokenizer
+
+
+class TestPipeline(unittest.TestCase):
+    """
+    流水线分词测试
+    """
+    def setUp(self):
+        self.cases = ['粗细粒度的区别包括三点十分2020年1月1日等。', '今天天气很好', '小米手机'] * 200
+
+    def test_pipeline(self):
+        tokenizer = MiNLPTokenizer(granularity='fine')
+        expected = tokenizer.cut(self.cases)
+        self.assertListEqual(tokenizer.cut(self.cases, pipeline=True), expected)
+        self.assertListEqual(tokenizer.cut(self.cases, length_bucketing=True, pipeline=True), expected)
+        self.assertListEqual(list(tokenizer.cut_iter(self.cases, batch_size=16, pipeline=True)), expected)
+
+    def test_pipeline_spans(self):
+        tokenizer = MiNLPTokenizer(granularity='coarse', cache_size=16)
+        expected = tokenizer.cut_spans(self.cases)
+        for spans, expected_spans in zip(tokenizer.cut_spans(self.cases, pipeline=True), expected):
+            self.assertListEqual(spans.tolist(), expected_spans.tolist())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+# Copyright 2020 The MiNLP Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+from minlptokenizer.tokenizer import MiNLPTokenizer
+from minlptokenizer.registry import LexiconRegistry
+from minlptokenizer.engine import BatchingEngine
+from minlptokenizer.exception import UnSupportedException
+
+
+class TestRegistry(unittest.TestCase):
+    """
+    多租户词典测试
+    """
+    def setUp(self):
+        self.case = '粗细粒度的区别包括三点十分2020年1月1日等。'
+        self.registry = LexiconRegistry()
+        self.registry.register('a', ['粗细粒度'])
+        self.registry.register('b', ['区别包括'])
+
+    def test_lazy_load_and_evict(self):
+        registry = LexiconRegistry(max_memory=1)
+        for idx in range(3):
+            registry.register(str(idx), ['词%d' % idx])
+        self.assertEqual(registry.info()['loaded'], 0)
+        for idx in range(3):
+            self.assertIn('词%d' % idx, registry.get(str(idx)))
+        # 超过内存上限时只保留最近使用的词典
+        info = registry.info()
+        self.assertEqual((info['loaded'], info['loads'], info['evictions']), (1, 3, 2))
+        with self.assertRaises(UnSupportedException):
+            registry.get('x')
+
+    def test_cut_tenants(self):
+        tokenizer = MiNLPTokenizer(lexicon_registry=self.registry)
+        expected = [MiNLPTokenizer(file_or_list=file_or_list).cut(self.case)
+                    for file_or_list in (['粗细粒度'], ['区别包括'], None)]
+        # 使用不同词典的句子在同一个batch中预测
+        self.assertListEqual(tokenizer.cut_tenants([self.case] * 3, ['a', 'b', None]), expected)
+        self.assertListEqual(tokenizer.cut_tenants(self.case, 'b'), expected[1])
+        with self.assertRaises(UnSupportedException):
+            tokenizer.cut_tenants(self.case, 'x')
+
+    def test_engine(self):
+        tokenizer = MiNLPTokenizer(lexicon_registry=self.registry, cache_size=16)
+        with BatchingEngine(tokenizer) as engine:
+            futures = [engine.submit(self.case, lexicon_id=lexicon_id) for lexicon_id in ('a', 'b', None, 'a')]
+            results = [future.result() for future in futures]
+        self.assertListEqual(results[0], MiNLPTokenizer(file_or_list=['粗细粒度']).cut(self.case))
+        self.assertListEqual(results[1], MiNLPTokenizer(file_or_list=['区别包括']).cut(self.case))
+        self.assertListEqual(results[3], results[0])
+
+    def test_engine_load_in_background(self):
+        self.registry.register('missing', '/nonexistent/lexicon.txt')
+        tokenizer = MiNLPTokenizer(lexicon_registry=self.registry)
+        with BatchingEngine(tokenizer) as engine:
+            with self.assertRaises(UnSupportedException):
+                engine.submit(self.case, lexicon_id='x')
+            # 提交时不加载词典，加载失败只影响使用该词典的请求
+            futures = [engine.submit(self.case, lexicon_id=lexicon_id) for lexicon_id in ('missing', 'a')]
+            with self.assertRaises(IOError):
+                futures[0].result()
+            self.assertListEqual(futures[1].result(), MiNLPTokenizer(file_or_list=['粗细粒度']).cut(self.case))
+
+
+if __name__ == '__main__':
+    unittest.main()
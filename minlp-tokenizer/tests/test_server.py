@@ -0,0 +1,152 @@
+# Copyright 2020 The MiNLP Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import asyncio
+import threading
+import unittest
+import contextlib
+import http.client
+from minlptokenizer.server import TokenizerServer
+from minlptokenizer.tokenizer import MiNLPTokenizer
+
+
+class TestServer(unittest.TestCase):
+    """
+    分词服务测试
+    """
+    @classmethod
+    def setUpClass(cls):
+        cls.server = TokenizerServer(lexicons={'user': ['粗细粒度']}, max_queue_size=64)
+        cls.loop = asyncio.new_event_loop()
+        cls.listener = cls.loop.run_until_complete(cls.server.start('127.0.0.1', 0))
+        cls.port = cls.listener.sockets[0].getsockname()[1]
+        cls.thread = threading.Thread(target=cls.loop.run_forever, daemon=True)
+        cls.thread.start()
+        cls.case = '粗细粒度的区别包括三点十分2020年1月1日等。'
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.loop.call_soon_threadsafe(cls.loop.stop)
+        cls.thread.join()
+        cls.listener.close()
+        cls.server.close()
+
+    def request(self, method, path, body=None):
+        connection = http.client.HTTPConnection('127.0.0.1', self.port)
+        try:
+            connection.request(method, path, body=body)
+            response = connection.getresponse()
+            return response.status, response.read().decode('UTF-8')
+        finally:
+            connection.close()
+
+    @contextlib.contextmanager
+    def patch_engine(self, tokenize):
+        """
+        替换fine引擎后台线程中的分词函数，退出上下文时恢复
+        """
+        engine = self.server.engines['fine']
+        engine.tokenizer._tokenize = tokenize
+        try:
+            yield engine
+        finally:
+            del engine.tokenizer._tokenize
+
+    def test_cut(self):
+        status, body = self.request('POST', '/cut', json.dumps({'text': self.case}).encode())
+        self.assertEqual(status, 200)
+        self.assertListEqual(json.loads(body)['result'], MiNLPTokenizer(granularity='fine').cut(self.case))
+        status, body = self.request('POST', '/cut', json.dumps({'texts': [self.case] * 2, 'granularity': 'coarse',
+                                                                'lexicon': 'user'}).encode())
+        expected = MiNLPTokenizer(['粗细粒度'], granularity='coarse').cut(self.case)
+        self.assertListEqual(json.loads(body)['result'], [expected] * 2)
+        self.assertEqual(self.request('POST', '/cut', json.dumps({'text': ' '}).encode())[0], 400)
+        self.assertEqual(self.request('POST', '/cut', json.dumps({'text': self.case, 'lexicon': 'x'}).encode())[0], 400)
+        status, body = self.request('POST', '/cut', json.dumps({'texts': [self.case, 1]}).encode())
+        self.assertEqual((status, json.loads(body)['error']), (400, 'text must be a string'))
+        # 超过排队上限的请求重试也无法成功
+        self.assertEqual(self.request('POST', '/cut', json.dumps({'texts': [self.case] * 1000}).encode())[0], 413)
+        entered, release = threading.Event(), threading.Event()
+
+        def blocked(texts, **kwargs):
+            entered.set()
+            release.wait()
+            return [[] for _ in texts]
+
+        with self.patch_engine(blocked) as engine:
+            futures = [engine.submit(self.case)]
+            entered.wait()  # 后台线程阻塞时排队已满
+            futures.extend(engine.submit(self.case) for _ in range(64))
+            self.assertEqual(self.request('POST', '/cut', json.dumps({'text': self.case}).encode())[0], 503)
+            release.set()
+            for future in futures:
+                future.result()
+        self.assertEqual(self.request('GET', '/health')[0], 200)
+
+    def test_cut_stream(self):
+        body = '\n'.join([self.case, '', self.case]).encode()
+        status, body = self.request('POST', '/cut/stream?granularity=coarse', body)
+        self.assertEqual(status, 200)
+        lines = [json.loads(line) for line in body.splitlines()]
+        expected = MiNLPTokenizer(granularity='coarse').cut(self.case)
+        self.assertListEqual([line.get('result') for line in lines], [expected, None, expected])
+        self.assertIn('error', lines[1])
+
+    def raw_request(self, data):
+        """
+        发送原始请求，返回响应状态码和json，连接被关闭时返回None
+        """
+        async def send():
+            reader, writer = await asyncio.open_connection('127.0.0.1', self.port)
+            try:
+                writer.write(data)
+                response = await reader.read()
+            finally:
+                writer.close()
+            if not response:
+                return None
+            head, _, body = response.partition(b'\r\n\r\n')
+            return int(head.split()[1]), json.loads(body.decode('UTF-8'))
+
+        return asyncio.run_coroutine_threadsafe(send(), self.loop).result(10)
+
+    def test_malformed_request(self):
+        # 格式错误的请求返回400后关闭连接，而不是直接断开
+        for data in (b'GET\r\n\r\n',
+                     b'POST /cut HTTP/1.1\r\nContent-Length: abc\r\n\r\n',
+                     b'POST /cut HTTP/1.1\r\nContent-Length: -1\r\n\r\n'):
+            self.assertEqual(self.raw_request(data), (400, {'error': 'malformed request'}))
+        status, body = self.raw_request(b'POST /cut HTTP/1.1\r\nTransfer-Encoding: chunked\r\n\r\nxyz\r\n')
+        self.assertEqual((status, body), (400, {'error': 'invalid chunk size'}))
+        self.assertEqual(self.raw_request(b'GET /health HTTP/1.1\r\nConnection: close\r\n\r\n')[0], 200)
+
+    def test_internal_error(self):
+        def failed(texts, **kwargs):
+            raise RuntimeError('internal details')
+
+        with self.patch_engine(failed):
+            status, body = self.request('POST', '/cut', json.dumps({'text': self.case}).encode())
+            self.assertEqual((status, json.loads(body)), (500, {'error': 'Internal Server Error'}))
+            status, body = self.request('POST', '/cut/stream', '\n'.join([self.case] * 3).encode())
+            self.assertEqual(status, 200)
+            self.assertListEqual([json.loads(line) for line in body.splitlines()],
+                                 [{'error': 'Internal Server Error'}] * 3)
+        status, body = self.request('POST', '/cut', json.dumps({'text': '小米\ud800手机'}).encode())
+        self.assertEqual(status, 200)
+        self.assertIn('\ud800', ''.join(json.loads(body)['result']))
+
+
+if __name__ == '__main__':
+    unittest.main()
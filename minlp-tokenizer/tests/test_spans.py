@@ -0,0 +1,52 @@
+# Copyright 2020 The MiNLP Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+from minlptokenizer.tag import Tag
+from minlptokenizer.tokenizer import MiNLPTokenizer, tag2words, tag2spans, format_string, format_string_with_offsets, \
+    map_spans
+
+
+class TestSpans(unittest.TestCase):
+    """
+    区间解码测试
+    """
+    def test_tag2spans(self):
+        S, B, M, E, X = Tag.S.value, Tag.B.value, Tag.M.value, Tag.E.value, Tag.X.value
+        texts = ['小米 手机', '好用']
+        spans = tag2spans(texts, [[B, E, S, B, E], [B, E, X, X, X]])
+        self.assertListEqual(spans[0].tolist(), [[0, 2], [3, 5]])
+        self.assertListEqual(spans[1].tolist(), [[0, 2]])
+        self.assertListEqual(tag2words('小米 手机', [B, M, M, M, E]), ['小米', '手机'])
+        self.assertListEqual(tag2words('小米\ud800手机', [B, E, S, B, E]), ['小米', '\ud800', '手机'])  # 单独的代理字符
+
+    def test_offsets(self):
+        raw = ' 　ＭＩ  小米\t手机 '
+        text, offsets = format_string_with_offsets(raw)
+        self.assertEqual(text, 'MI 小米 手机')
+        self.assertListEqual(map_spans(tag2spans([text], [[2, 4, 1, 2, 4, 1, 2, 4]])[0], offsets).tolist(),
+                             [[2, 4], [6, 8], [9, 11]])
+
+    def test_cut_spans(self):
+        with MiNLPTokenizer(granularity='fine') as tokenizer:
+            text = '  今天天气怎么样？\t２０２０年 '
+            spans = tokenizer.cut_spans(text)
+            self.assertListEqual([format_string(text[start:end]) for start, end in spans.tolist()], tokenizer.cut(text))
+            self.assertListEqual(tokenizer.cut_spans([text, text], n_jobs=2)[1].tolist(), spans.tolist())
+            self.assertListEqual(tokenizer.cut_spans(text, split_long_text=True).tolist(), spans.tolist())
+            self.assertIn('\ud800', ''.join(tokenizer.cut('小米\ud800手机')))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,43 @@
+# Copyright 2020 The MiNLP Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pickle
+import unittest
+import numpy as np
+from minlptokenizer.transport import WordBatch, SpanBatch, SHARED_MEMORY_THRESHOLD
+
+
+class TestTransport(unittest.TestCase):
+    """
+    多进程分词结果传输格式测试
+    """
+    def test_word_batch(self):
+        results = [['小米', '手机'], ['好'], ['2020', '年', '1', '月']]
+        batch = pickle.loads(pickle.dumps(WordBatch(results)))
+        self.assertEqual(len(batch), 3)
+        self.assertListEqual(list(batch), results)
+        self.assertListEqual(list(WordBatch([])), [])
+
+    def test_span_batch(self):
+        small = [np.array([[0, 2], [2, 4]], dtype=np.int32), np.array([[0, 1]], dtype=np.int32)]
+        large = [np.arange(SHARED_MEMORY_THRESHOLD // 4, dtype=np.int32).reshape(-1, 2)] * 2  # 超过阈值时使用共享内存
+        for results in (small, large):
+            batch = pickle.loads(pickle.dumps(SpanBatch(results)))
+            self.assertEqual(len(batch), len(results))
+            for spans, expected in zip(batch, results):
+                self.assertListEqual(spans.tolist(), expected.tolist())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -14,6 +14,7 @@
 
 import unittest
 import os
+import numpy as np
 from minlptokenizer.vocab import Vocab
 from minlptokenizer.config import configs
 
@@ -29,7 +30,7 @@ class TestVocab(unittest.TestCase):
     def test_get_char_ids(self):
         s = ['让全球每个人都能享受科技带来的美好生活', '科技带来的美好生活', '美好生活']
         self.assertListEqual(
-            self.vocab.get_char_ids(s),
+            self.vocab.get_char_ids(s).tolist(),
             [
                 [568, 117, 442, 464, 115, 5, 187, 106, 1456, 363, 88, 353, 357, 66, 8, 150, 193, 21, 423],
                 [88, 353, 357, 66, 8, 150, 193, 21, 423, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
@@ -37,6 +38,11 @@ class TestVocab(unittest.TestCase):
             ]
         )
 
+    def test_oov(self):
+        char_ids = self.vocab.get_char_ids(['美\U0001F600', '好'])
+        self.assertEqual(char_ids.dtype, np.int32)
+        self.assertListEqual(char_ids.tolist(), [[150, self.vocab.oovCharID], [193, self.vocab.padCharID]])
+
 
 if __name__ == '__main__':
     unittest.main()